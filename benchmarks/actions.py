@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Evaluates random arithmetic expressions with the calculator grammar of
+# examples/demo.py, once by building the AST and traversing it with post_*
+# methods, and once by reduction actions while parsing (tree="value"), and
+# compares the results and times.
+
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.setrecursionlimit(100000)
+
+from pynetree import Parser
+
+grammar = {
+	"factor": ["@INT", "( expr )"],
+	"@mul": "term * factor",
+	"@div": "term / factor",
+	"term": ["mul", "div", "factor"],
+	"@add": "expr + term",
+	"@sub": "expr - term",
+	"expr": ["add", "sub", "term"],
+	"@calc$": "expr"
+}
+
+class Calculator(Parser):
+	def __init__(self):
+		super(Calculator, self).__init__(grammar)
+		self.token("INT", r"\d+")
+		self.ignore(r"\s+")
+		self.stack = []
+
+	def post_INT(self, node):
+		self.stack.append(float(node.match))
+
+	def post_add(self, node):
+		self.stack.append(self.stack.pop() + self.stack.pop())
+
+	def post_sub(self, node):
+		x = self.stack.pop()
+		self.stack.append(self.stack.pop() - x)
+
+	def post_mul(self, node):
+		self.stack.append(self.stack.pop() * self.stack.pop())
+
+	def post_div(self, node):
+		x = self.stack.pop()
+		self.stack.append(self.stack.pop() / x)
+
+def build():
+	p = Parser(grammar)
+	p.token("INT", r"\d+")
+	p.ignore(r"\s+")
+
+	p.action("INT", float)
+	p.action("add", lambda x, y: x + y)
+	p.action("sub", lambda x, y: x - y)
+	p.action("mul", lambda x, y: x * y)
+	p.action("div", lambda x, y: x / y)
+	p.action("calc", lambda x: x)
+
+	return p
+
+def expr(rnd, depth):
+	if depth <= 0 or rnd.random() < 0.3:
+		return str(rnd.randint(1, 99))
+	elif rnd.random() < 0.2:
+		return "(%s)" % expr(rnd, depth - 1)
+
+	return "%s %s %s" % (expr(rnd, depth - 1), rnd.choice("+-*/"), expr(rnd, depth - 1))
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree reduction action benchmark")
+	ap.add_argument("-n", "--count", type=int, default=200,
+					help="Number of expressions (default: 200)")
+	ap.add_argument("-s", "--seed", type=int, default=1,
+					help="Random seed (default: 1)")
+	args = ap.parse_args()
+
+	rnd = random.Random(args.seed)
+	inputs = [expr(rnd, 10) for i in range(args.count)]
+
+	calc = Calculator()
+	start = time.time()
+	traversed = []
+
+	for s in inputs:
+		try:
+			calc.traverse(calc.parse(s))
+			traversed.append(calc.stack.pop())
+		except ZeroDivisionError:
+			calc.stack = []
+			traversed.append(None)
+
+	elapsed = time.time() - start
+
+	p = build()
+	start = time.time()
+	computed = []
+
+	for s in inputs:
+		try:
+			computed.append(p.parse(s, tree = "value"))
+		except ZeroDivisionError:
+			computed.append(None)
+
+	reduced = time.time() - start
+
+	print("%10s %10s %12s %12s" % ("inputs", "bytes", "traverse", "actions"))
+	print("%10d %10d %12.3f %12.3f" % (len(inputs), sum([len(s) for s in inputs]),
+										elapsed, reduced))
+
+	if traversed != computed:
+		print("Results differ")
+		sys.exit(1)
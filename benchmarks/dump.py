@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Parses the program of examples/xpl.py, repeated a given number of times, and
+# writes the AST to a file by the former recursive Node.dump(), which printed
+# every node, and by Node.dump() in every output format. The first methods are
+# also run on a line buffered file, as stdout is on a terminal.
+
+import argparse, os, sys, tempfile, time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+
+from pynetree import Parser
+
+examples = os.path.join(root, "examples")
+
+def recursive(node, level = 0):
+	"""
+	The former Node.dump(), printing the tree by recursion.
+	"""
+	if node.symbol or node.emit:
+		print("%s%s" % (level * " ", str(node)))
+		level += 1
+
+	for child in node.children:
+		recursive(child, level)
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree AST output benchmark")
+	ap.add_argument("-n", "--count", type=int, default=2000,
+					help="Number of times the program is repeated (default: 2000)")
+	args = ap.parse_args()
+
+	src = open(os.path.join(examples, "xpl.py")).read()
+	grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+	program = src.split('p.parse("""')[1].split('""")')[0]
+
+	p = Parser(grammar)
+	s = "\n".join([program] * args.count)
+	ast = p.parse(s)
+
+	count = 0
+	stack = [ast]
+	while stack:
+		count += 1
+		stack.extend(stack.pop().children)
+
+	fd, name = tempfile.mkstemp(suffix=".txt")
+	os.close(fd)
+
+	def former(f):
+		stdout = sys.stdout
+		sys.stdout = f
+
+		try:
+			recursive(ast)
+		finally:
+			sys.stdout = stdout
+
+	# Methods, and whether their file is line buffered like a terminal
+	methods = [
+		("print()", former, False),
+		("print(), tty", former, True),
+		("text", lambda f: ast.dump(f=f), False),
+		("text, tty", lambda f: ast.dump(f=f), True),
+		("text, offsets", lambda f: ast.dump(f=f, offsets=True), False),
+		("json", lambda f: ast.dump(f=f, format="json"), False),
+		("json, offsets", lambda f: ast.dump(f=f, format="json", offsets=True), False),
+		("sexpr", lambda f: ast.dump(f=f, format="sexpr"), False),
+		("sexpr, offsets", lambda f: ast.dump(f=f, format="sexpr", offsets=True), False)
+	]
+
+	try:
+		print("%d bytes of input, %d nodes" % (len(s), count))
+		print("%-16s %12s %10s" % ("method", "bytes", "seconds"))
+
+		output = {}
+
+		for method, function, tty in methods:
+			f = open(name, "w", 1 if tty else -1)
+
+			start = time.time()
+			function(f)
+			f.close()
+			elapsed = time.time() - start
+
+			output[method] = open(name).read()
+			print("%-16s %12d %10.3f" % (method, len(output[method]), elapsed))
+
+	finally:
+		os.unlink(name)
+
+	if output["print()"] != output["text"]:
+		print("Text output differs")
+		sys.exit(1)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Parses the inputs of the bundled examples, repeated a given number of
+# times, with the example's parser and with the module generated from it by
+# Parser.generate(), and compares the ASTs and times.
+
+import argparse, os, re, sys, time, types
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+
+from pynetree import Parser
+
+examples = os.path.join(root, "examples")
+
+# Examples, and how their inputs are repeated
+inputs = [
+	("calc.py", " + "),
+	("calcbnf.py", " + "),
+	("demo.py", " + "),
+	("first.py", " + "),
+	("firstbnf.py", " + "),
+	("xpl.py", "\n")
+]
+
+def load(name):
+	"""
+	Runs the example ``name``, and returns its parser and input.
+	"""
+	src = open(os.path.join(examples, name)).read()
+	s = re.search(r'\.parse\(("""(?:.|\n)*?"""|"[^"]*")\)', src).group(1)
+
+	stdout = sys.stdout
+	sys.stdout = open(os.devnull, "w")
+
+	try:
+		scope = {"__name__": "example"}
+		exec(compile(src, name, "exec"), scope)
+	finally:
+		sys.stdout.close()
+		sys.stdout = stdout
+
+	p = [value for value in scope.values() if isinstance(value, Parser)][0]
+	return p, eval(s)
+
+def generate(p):
+	"""
+	Returns the module generated from parser ``p``.
+	"""
+	module = types.ModuleType("generated")
+	exec(compile(p.generate(), "generated", "exec"), module.__dict__)
+	return module
+
+def nodes(ast):
+	"""
+	Returns the nodes of ``ast`` in pre-order, as comparable tuples.
+	"""
+	res = []
+	stack = [ast]
+
+	while stack:
+		node = stack.pop()
+		res.append((node.symbol, node.emit, node.rule, node.match))
+		stack.extend(reversed(node.children))
+
+	return res
+
+def best(function, repeat):
+	res = None
+
+	for i in range(repeat):
+		start = time.time()
+		function()
+		elapsed = time.time() - start
+
+		if res is None or elapsed < res:
+			res = elapsed
+
+	return res
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree generated parser benchmark")
+	ap.add_argument("-n", "--count", type=int, default=100,
+					help="Number of times each example input is repeated (default: 100)")
+	ap.add_argument("-r", "--repeat", type=int, default=3,
+					help="Number of runs, the best is reported (default: 3)")
+	ap.add_argument("-O", "--optimize", action="store_true",
+					help="Optimize the grammars")
+	args = ap.parse_args()
+
+	print("%-12s %10s %10s %12s %12s %8s" % ("example", "bytes", "nodes",
+												"interpreted", "generated", "speedup"))
+
+	failed = False
+
+	for name, sep in inputs:
+		p, s = load(name)
+		p.optimize = args.optimize
+		p.compile()
+
+		s = sep.join([s] * args.count)
+		module = generate(p)
+
+		expected = nodes(p.parse(s))
+		if nodes(module.parse(s)) != expected:
+			print("%-12s ASTs differ" % name)
+			failed = True
+			continue
+
+		interpreted = best(lambda: p.parse(s), args.repeat)
+		generated = best(lambda: module.parse(s), args.repeat)
+
+		print("%-12s %10d %10d %12.3f %12.3f %7.1fx" % (name, len(s), len(expected),
+														interpreted, generated,
+														interpreted / generated))
+
+	if failed:
+		sys.exit(1)
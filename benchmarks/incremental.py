@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Builds an XPL program of about 1 MB from the program of examples/xpl.py,
+# applies random one-line edits to it by a ParseSession, and compares the
+# time of the updates with a full parse. The AST of the final text is
+# checked against Parser.parse().
+
+import argparse, os, random, sys, time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+
+from pynetree import Parser, ParseSession
+
+examples = os.path.join(root, "examples")
+
+# Edits, as the replaced line and the replacement
+edits = [
+	("    bottles = 99;", "    bottles = 98 + 1;"),
+	("    bottles = 98 + 1;", "    bottles = 99;"),
+	("    print( \"No more bottles of beer on the wall.\" );",
+		"    print( \"No more bottles of beer.\" );"),
+	("    print( \"No more bottles of beer.\" );",
+		"    print( \"No more bottles of beer on the wall.\" );")
+]
+
+def nodes(ast):
+	"""
+	Returns the nodes of ``ast`` in pre-order, as comparable tuples.
+	"""
+	res = []
+	stack = [ast]
+
+	while stack:
+		node = stack.pop()
+		res.append((node.symbol, node.emit, node.rule, node.match))
+		stack.extend(reversed(node.children))
+
+	return res
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree incremental reparsing benchmark")
+	ap.add_argument("-s", "--size", type=int, default=1000000,
+					help="Minimal size of the program in bytes (default: 1000000)")
+	ap.add_argument("-e", "--edits", type=int, default=100,
+					help="Number of edits (default: 100)")
+	args = ap.parse_args()
+
+	src = open(os.path.join(examples, "xpl.py")).read()
+	grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+	program = src.split('p.parse("""')[1].split('""")')[0]
+
+	p = Parser(grammar)
+	s = "\n".join([program] * (args.size // len(program) + 1))
+
+	start = time.time()
+	p.parse(s)
+	full = time.time() - start
+
+	start = time.time()
+	session = ParseSession(p, s, "statement")
+	initial = time.time() - start
+
+	rnd = random.Random(0)
+	times = []
+
+	for i in range(args.edits):
+		old, new = rnd.choice(edits)
+
+		# Take a random occurrence of the line to be edited
+		pos = s.find(old, rnd.randint(0, len(s)))
+		if pos < 0:
+			pos = s.find(old)
+		if pos < 0:
+			continue
+
+		start = time.time()
+		session.update(pos, pos + len(old), new)
+		times.append(time.time() - start)
+
+		s = session.text
+
+	times.sort()
+
+	print("%-24s %12s" % ("program", "%d bytes" % len(s)))
+	print("%-24s %12.3f s" % ("Parser.parse()", full))
+	print("%-24s %12.3f s" % ("ParseSession()", initial))
+	print("%-24s %12.2f ms" % ("update(), median", times[len(times) // 2] * 1000))
+	print("%-24s %12.2f ms" % ("update(), maximum", times[-1] * 1000))
+	print("%-24s %12.0fx" % ("speedup, median", full / times[len(times) // 2]))
+
+	if nodes(session.tree) != nodes(p.parse(s)):
+		print("ASTs differ")
+		sys.exit(1)
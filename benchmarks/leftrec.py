@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Parses long expressions with the indirect left-recursive calculator grammar
+# from examples/demo.py, flat and nested.
+
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.setrecursionlimit(100000)
+
+from pynetree import Parser
+
+def build():
+	p = Parser({
+		"factor": ["@INT", "( expr )"],
+		"@mul": "term * factor",
+		"@div": "term / factor",
+		"term": ["mul", "div", "factor"],
+		"@add": "expr + term",
+		"@sub": "expr - term",
+		"expr": ["add", "sub", "term"],
+		"@calc$": "expr"
+	})
+
+	p.token("INT", r"\d+")
+	p.ignore(r"\s+")
+
+	return p
+
+def flat(n):
+	return " + ".join(["%d * %d - %d / 7" % (i, i + 1, i + 2) for i in range(n)])
+
+def nested(n):
+	return "(" * n + "1" + "".join([" + %d)" % i for i in range(n)])
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree left-recursion benchmark")
+	ap.add_argument("-n", "--count", type=int, default=10000,
+					help="Number of terms in the flat expression (default: 10000)")
+	ap.add_argument("-d", "--depth", type=int, default=500,
+					help="Nesting depth of the nested expression (default: 500)")
+	args = ap.parse_args()
+
+	p = build()
+
+	for name, s in [("flat", flat(args.count)), ("nested", nested(args.depth))]:
+		start = time.time()
+		p.parse(s)
+		elapsed = time.time() - start
+
+		print("%-8s %10d bytes %10.3f seconds" % (name, len(s), elapsed))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Parses operator-heavy expressions with a C-like grammar of ten precedence
+# levels, where many literals share prefixes ("<", "<<", "<=", "<<="), and
+# reports the time spent and the literal scanner calls.
+
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.setrecursionlimit(100000)
+
+from pynetree import Parser
+
+def build():
+	return Parser(r"""
+		%skip /\s+/;
+		@IDENT /[a-z_]\w*/;
+		@INT /\d+/;
+
+		@assign: unary "=" assign | unary "+=" assign | unary "-=" assign
+				| unary "<<=" assign | unary ">>=" assign | unary "&=" assign
+				| unary "|=" assign | lor;
+		@or: lor "||" land;
+		lor: or | land;
+		@and: land "&&" bor;
+		land: and | bor;
+		@bor: bor "|" bxor | bxor;
+		@bxor: bxor "^" band | band;
+		@band: band "&" eq | eq;
+		@eq: eq "==" rel | eq "!=" rel | rel;
+		@rel: rel "<=" shift | rel ">=" shift | rel "<" shift | rel ">" shift | shift;
+		@shift: shift "<<" add | shift ">>" add | add;
+		@add: add "+" mul | add "-" mul | mul;
+		@mul: mul "*" unary | mul "/" unary | mul "%" unary | unary;
+		@unary: "!" unary | "-" unary | "~" unary | "++" unary | "--" unary | atom;
+		atom: IDENT | INT | '(' assign ')';
+
+		@stmt: assign ';';
+		program$: stmt*;
+	""")
+
+operators = ["||", "&&", "|", "^", "&", "==", "!=", "<=", ">=", "<", ">",
+				"<<", ">>", "+", "-", "*", "/", "%"]
+
+def generate(rnd, count):
+	stmts = []
+
+	for i in range(count):
+		expr = rnd.choice(["a", "b", "1", "42"])
+
+		for j in range(rnd.randint(1, 12)):
+			operand = rnd.choice(["a", "b", "c", "7", "(x + 1)", "!y", "-z", "~w"])
+			expr += " %s %s" % (rnd.choice(operators), operand)
+
+		stmts.append("%s %s %s;" % (rnd.choice(["x", "y"]),
+									rnd.choice(["=", "+=", "<<=", "|="]), expr))
+
+	return "\n".join(stmts)
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree literal scanner benchmark")
+	ap.add_argument("-n", "--count", type=int, default=2000,
+					help="Number of statements (default: 2000)")
+	ap.add_argument("-r", "--repeat", type=int, default=3,
+					help="Number of runs, the best is reported (default: 3)")
+	args = ap.parse_args()
+
+	p = build()
+	s = generate(random.Random(1), args.count)
+	best = None
+
+	for i in range(args.repeat):
+		start = time.time()
+		p.parse(s)
+		elapsed = time.time() - start
+
+		if best is None or elapsed < best:
+			best = elapsed
+
+	print("%10s %10s %12s %12s %12s" % ("bytes", "seconds", "KB/s",
+										"scans", "scan hits"))
+	print("%10d %10.3f %12.1f %12d %12d" % (len(s), best, len(s) / 1024.0 / best,
+											p.stats["scans"], p.stats["scan_hits"]))
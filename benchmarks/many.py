@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Parses a batch of inputs made of the program of examples/xpl.py, one by one
+# with Parser.parse(), and with Parser.parse_many() by different numbers of
+# worker processes, and compares the times.
+
+import argparse, multiprocessing, os, sys, time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+
+from pynetree import Parser, ParseError
+
+examples = os.path.join(root, "examples")
+
+def nodes(ast):
+	"""
+	Returns the nodes of ``ast`` in pre-order, as comparable tuples.
+	"""
+	res = []
+	stack = [ast]
+
+	while stack:
+		node = stack.pop()
+		res.append((node.symbol, node.emit, node.rule, node.match))
+		stack.extend(reversed(node.children))
+
+	return res
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree parse_many() benchmark")
+	ap.add_argument("-n", "--count", type=int, default=400,
+					help="Number of inputs (default: 400)")
+	ap.add_argument("-l", "--length", type=int, default=4,
+					help="Number of times the program is repeated per input (default: 4)")
+	ap.add_argument("-c", "--chunksize", type=int, default=4,
+					help="Number of inputs per task (default: 4)")
+	ap.add_argument("-w", "--workers", type=int, nargs="+",
+					help="Numbers of workers (default: 1, 2, 4 and the number of CPUs)")
+	args = ap.parse_args()
+
+	src = open(os.path.join(examples, "xpl.py")).read()
+	grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+	program = src.split('p.parse("""')[1].split('""")')[0]
+
+	p = Parser(grammar)
+
+	# Every tenth input contains an error
+	inputs = []
+	for i in range(args.count):
+		s = "\n".join([program] * args.length)
+		if i % 10 == 9:
+			s += "\nx = ;"
+
+		inputs.append(s)
+
+	def serial():
+		res = []
+
+		for i, s in enumerate(inputs):
+			try:
+				res.append((i, p.parse(s)))
+			except ParseError as e:
+				res.append((i, e))
+
+		return res
+
+	start = time.time()
+	expected = serial()
+	elapsed = time.time() - start
+
+	print("%d inputs of %d bytes, %d CPUs" % (len(inputs), len(inputs[0]),
+												multiprocessing.cpu_count()))
+	print("%-16s %10s %12s" % ("method", "seconds", "inputs/s"))
+	print("%-16s %10.3f %12.1f" % ("parse()", elapsed, len(inputs) / elapsed))
+
+	failed = False
+
+	for workers in args.workers or sorted(set([1, 2, 4, multiprocessing.cpu_count()])):
+		start = time.time()
+		res = list(p.parse_many(inputs, workers=workers, chunksize=args.chunksize))
+		elapsed = time.time() - start
+
+		print("%-16s %10.3f %12.1f" % ("%d workers" % workers, elapsed,
+											len(inputs) / elapsed))
+
+		for (i, tree), (j, ref) in zip(res, expected):
+			if isinstance(ref, ParseError):
+				same = isinstance(tree, ParseError) and tree.offset == ref.offset
+			else:
+				same = not isinstance(tree, ParseError) and nodes(tree) == nodes(ref)
+
+			if i != j or not same:
+				print("Result %d differs" % j)
+				failed = True
+				break
+
+	if failed:
+		sys.exit(1)
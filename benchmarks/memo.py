@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Compares the memo table backends by parse time and peak number of entries.
+
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.setrecursionlimit(100000)
+
+from pynetree import DictMemo, ArrayMemo, WindowMemo
+from scaling import build, generate
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree memo table benchmark")
+	ap.add_argument("-s", "--size", type=int, default=1024 * 1024,
+					help="Input size in bytes (default: 1 MB)")
+	args = ap.parse_args()
+
+	p = build()
+	s = generate(args.size)
+
+	print("%-20s %10s %12s" % ("memo", "seconds", "peak"))
+
+	for name, memo in [("DictMemo", DictMemo()),
+						("ArrayMemo", ArrayMemo()),
+						("WindowMemo(65536)", WindowMemo(65536)),
+						("WindowMemo(4096)", WindowMemo(4096)),
+						("WindowMemo(256)", WindowMemo(256))]:
+		start = time.time()
+		p.parse(s, memo=memo)
+		elapsed = time.time() - start
+
+		print("%-20s %10.3f %12d" % (name, elapsed, p.stats["memo_peak"]))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Parses deeply nested inputs with the grammar of examples/xpl.py: nested
+# blocks, parenthesized expressions, nested function calls emitting one
+# node per level, and a long statement list. The recursion limit is left
+# at its default, as the parser does not recurse by nesting depth.
+
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pynetree import Parser
+
+examples = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples")
+
+def measure(ast):
+	nodes = 0
+	depth = 0
+	stack = [(ast, 0)]
+
+	while stack:
+		node, level = stack.pop()
+		nodes += 1
+		depth = max(depth, level)
+		stack.extend([(child, level + 1) for child in node.children])
+
+	return nodes, depth
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree nesting depth stress test")
+	ap.add_argument("-n", "--depth", type=int, default=100000,
+					help="Nesting depth (default: 100000)")
+	ap.add_argument("-l", "--lexer", action="store_true",
+					help="Parse in lexer-first mode")
+	args = ap.parse_args()
+
+	src = open(os.path.join(examples, "xpl.py")).read()
+	grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+	p = Parser(grammar)
+
+	n = args.depth
+	inputs = [
+		("blocks", "{" * n + "x = 1;" + "}" * n),
+		("parens", "x = " + "(" * n + "1" + ")" * n + ";"),
+		("calls", "x = " + "f(" * n + "1" + ")" * n + ";"),
+		("statements", "x = 1;\n" * n)
+	]
+
+	print("%-12s %10s %10s %10s %10s" % ("input", "bytes", "seconds", "nodes", "depth"))
+
+	for name, s in inputs:
+		start = time.time()
+		ast = p.parse(s, lexer = args.lexer)
+		elapsed = time.time() - start
+
+		nodes, depth = measure(ast)
+		print("%-12s %10d %10.3f %10d %10d" % (name, len(s), elapsed, nodes, depth))
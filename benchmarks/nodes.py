@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Measures the memory held by the AST of the XPL example program from
+# examples/xpl.py, repeated up to a given number of top-level statements,
+# and reports the bytes per AST node. With --events, the nodes are only
+# counted from Parser.parse_events(), and the peak memory is compared.
+#
+# The memory is traced by tracemalloc while parsing, which makes parsing
+# several times slower; the default of 100000 statements takes a while.
+
+import argparse, gc, os, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.setrecursionlimit(100000)
+
+from pynetree import Parser, FlatTree, WindowMemo
+
+examples = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples")
+
+def build():
+	src = open(os.path.join(examples, "xpl.py")).read()
+	grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+	program = src.split('p.parse("""')[1].split('""")')[0]
+
+	return Parser(grammar), program
+
+def count(ast):
+	if isinstance(ast, FlatTree):
+		return len(ast)
+
+	res = 0
+	stack = [ast]
+
+	while stack:
+		node = stack.pop()
+		stack.extend(node.children)
+		res += 1
+
+	return res
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree AST memory benchmark")
+	ap.add_argument("-n", "--count", type=int, default=100000,
+					help="Number of top-level statements (default: 100000)")
+	ap.add_argument("-f", "--flat", action="store_true",
+					help="Build a FlatTree instead of Node objects")
+	ap.add_argument("-e", "--events", action="store_true",
+					help="Count the events of Parser.parse_events() instead")
+	args = ap.parse_args()
+
+	p, program = build()
+
+	# The example program has six top-level statements
+	s = program * ((args.count + 5) // 6)
+
+	# Warm up the lazily filled dispatch tables of the grammar
+	p.parse(program)
+
+	tracemalloc.start()
+	gc.collect()
+	before = tracemalloc.get_traced_memory()[0]
+
+	start = time.time()
+
+	if args.events:
+		ast = None
+		nodes = len([event for event in p.parse_events(s, memo = WindowMemo())
+						if event[0] != "exit"])
+	else:
+		ast = p.parse(s, memo = WindowMemo(), tree = "flat" if args.flat else "node")
+
+	elapsed = time.time() - start
+
+	gc.collect()
+	size, peak = tracemalloc.get_traced_memory()
+	size -= before
+	peak -= before
+	tracemalloc.stop()
+
+	if ast:
+		nodes = count(ast)
+
+	print("%10s %10s %10s %12s %10s %12s" % ("bytes", "seconds", "nodes",
+												"AST bytes", "per node", "peak bytes"))
+	print("%10d %10.3f %10d %12d %10.1f %12d" % (len(s), elapsed, nodes,
+												size, float(size) / nodes, peak))
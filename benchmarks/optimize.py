@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Parses a corpus of grammars and inputs with and without the grammar
+# optimizer (Parser(..., optimize=True)), checks that the ASTs and the offsets
+# of parse errors are identical, and compares the parsing times.
+
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.setrecursionlimit(100000)
+
+from pynetree import Parser, ParseError
+
+examples = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples")
+
+def xpl():
+	src = open(os.path.join(examples, "xpl.py")).read()
+	grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+	program = src.split('p.parse("""')[1].split('""")')[0]
+
+	def generate(rnd):
+		return program + "".join(["i = %d; if (i <= %d) j = f(i, -i * %d); else { k = i; }\n"
+									% (rnd.randint(0, 99), rnd.randint(0, 99),
+										rnd.randint(0, 99))
+										for i in range(rnd.randint(0, 20))])
+
+	def build(optimize):
+		return Parser(grammar, optimize = optimize)
+
+	return build, generate
+
+def calc():
+	grammar = {
+		"factor": ["@INT", "( expr )"],
+		"@mul": "term * factor",
+		"@div": "term / factor",
+		"term": ["mul", "div", "factor"],
+		"@add": "expr + term",
+		"@sub": "expr - term",
+		"expr": ["add", "sub", "term"],
+		"@calc$": "expr"
+	}
+
+	def build(optimize):
+		p = Parser(grammar, optimize = optimize)
+		p.token("INT", r"\d+")
+		p.ignore(r"\s+")
+
+		return p
+
+	def expr(rnd, depth):
+		if depth <= 0 or rnd.random() < 0.3:
+			return str(rnd.randint(0, 99))
+		elif rnd.random() < 0.2:
+			return "(%s)" % expr(rnd, depth - 1)
+
+		return "%s %s %s" % (expr(rnd, depth - 1), rnd.choice("+-*/"),
+								expr(rnd, depth - 1))
+
+	def generate(rnd):
+		return expr(rnd, 8)
+
+	return build, generate
+
+def lists():
+	grammar = r"""
+		%skip /\s+/;
+		@IDENT /[a-z]+/;
+		@INT /\d+/;
+
+		op: '<=' | '<' | '+' | '-' | '*' | '/';
+		@call: IDENT '(' args ')' | IDENT '(' ')';
+		args: value ',' args | value;
+		value: call | IDENT | INT | '[' list ']' | '[' ']';
+		list: value ',' list | value;
+		@binop: value op value;
+		type: 'int' | 'float' | 'str';
+		@decl: type IDENT '=' value ';' | type IDENT ';';
+		@stmt: 'let' IDENT '=' binop ';' | 'let' IDENT '=' value ';' | 'print' value ';' | decl;
+		prog$: stmt*;
+	"""
+
+	def value(rnd, depth):
+		r = rnd.random()
+
+		if depth <= 0 or r < 0.3:
+			return rnd.choice(["a", "b", "foo", "1", "23"])
+		elif r < 0.5:
+			return "f(%s)" % ", ".join([value(rnd, depth - 1)
+										for i in range(rnd.randint(0, 3))])
+
+		return "[%s]" % ", ".join([value(rnd, depth - 1)
+									for i in range(rnd.randint(0, 3))])
+
+	def generate(rnd):
+		stmts = []
+
+		for i in range(rnd.randint(1, 20)):
+			r = rnd.random()
+
+			if r < 0.4:
+				stmts.append("let x = %s %s %s;" % (value(rnd, 3),
+							rnd.choice(["<=", "<", "+", "-", "*", "/"]), value(rnd, 3)))
+			elif r < 0.6:
+				stmts.append("let y = %s;" % value(rnd, 4))
+			elif r < 0.7:
+				stmts.append("int z = %s;" % value(rnd, 4))
+			elif r < 0.8:
+				stmts.append("%s z;" % rnd.choice(["int", "float", "str"]))
+			else:
+				stmts.append("print %s;" % value(rnd, 4))
+
+		return "\n".join(stmts)
+
+	def build(optimize):
+		return Parser(grammar, optimize = optimize)
+
+	return build, generate
+
+def inlined():
+	# Nonterminals inlined by the optimizer must still move the offset of
+	# parse errors, e.g. "xx" and "xxxx+" fail at 2 and 4.
+	grammar = {
+		"A$": ["D D c", "X C ("],
+		"C": ["X X @D"],
+		"D": ["", "a", "a b"]
+	}
+
+	def build(optimize):
+		p = Parser(grammar, optimize = optimize)
+		p.token("X", r"x+|y")
+
+		return p
+
+	def generate(rnd):
+		return "".join([rnd.choice(["x", "xx", "y", "a", "b", "c", "(", "+"])
+							for i in range(rnd.randint(0, 8))])
+
+	return build, generate
+
+def mutate(rnd, s):
+	pos = rnd.randint(0, len(s))
+	return s[:pos] + rnd.choice(["", ";", "(", "]", "<", "x"]) + s[pos + 1:]
+
+def shape(node):
+	res = []
+	stack = [(node, 0)]
+
+	while stack:
+		node, depth = stack.pop()
+		res.append((depth, node.symbol, node.emit, node.rule, node.match))
+		stack.extend([(child, depth + 1) for child in reversed(node.children or [])])
+
+	return res
+
+def run(p, inputs):
+	res = []
+	start = time.time()
+
+	for s in inputs:
+		try:
+			res.append(shape(p.parse(s)))
+		except ParseError as e:
+			res.append(e.offset)
+
+	return res, time.time() - start
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree grammar optimizer benchmark")
+	ap.add_argument("-n", "--count", type=int, default=100,
+					help="Number of inputs per grammar (default: 100)")
+	ap.add_argument("-s", "--seed", type=int, default=1,
+					help="Random seed (default: 1)")
+	args = ap.parse_args()
+
+	print("%-8s %8s %8s %10s %10s %14s %14s" % ("grammar", "inputs", "errors",
+		"seconds", "optimized", "alternatives", "optimized"))
+
+	failed = False
+
+	for name, corpus in [("xpl", xpl), ("calc", calc), ("lists", lists), ("inlined", inlined)]:
+		build, generate = corpus()
+		rnd = random.Random(args.seed)
+
+		inputs = [generate(rnd) for i in range(args.count)]
+		if name == "inlined":
+			inputs += ["xx", "xxxx+"]
+
+		inputs += [mutate(rnd, s) for s in inputs[:args.count // 4]]
+
+		results = []
+
+		for optimize in [False, True]:
+			p = build(optimize)
+			asts, elapsed = run(p, inputs)
+			alternatives = 0
+
+			for s in inputs:
+				try:
+					p.parse(s)
+				except ParseError:
+					pass
+
+				alternatives += p.stats["alternatives"]
+
+			results.append((asts, elapsed, alternatives))
+
+		print("%-8s %8d %8d %10.3f %10.3f %14d %14d" % (name, len(inputs),
+				len([res for res in results[0][0] if isinstance(res, int)]),
+				results[0][1], results[1][1],
+				results[0][2], results[1][2]))
+
+		for s, plain, optimized in zip(inputs, results[0][0], results[1][0]):
+			if plain != optimized:
+				print("%-8s ASTs or errors differ for %r" % (name, s[:60]))
+				failed = True
+
+	if failed:
+		sys.exit(1)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Compares the left-recursive calculator grammar from examples/demo.py with
+# the same language declared by operator precedences, which is parsed by
+# precedence climbing. Both grammars must yield the same AST.
+
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.setrecursionlimit(100000)
+
+from pynetree import Parser
+
+def leftrec():
+	p = Parser({
+		"factor": ["@INT", "( expr )"],
+		"@mul": "term * factor",
+		"@div": "term / factor",
+		"term": ["mul", "div", "factor"],
+		"@add": "expr + term",
+		"@sub": "expr - term",
+		"expr": ["add", "sub", "term"],
+		"@calc$": "expr"
+	})
+
+	p.token("INT", r"\d+")
+	p.ignore(r"\s+")
+
+	return p
+
+def precedence():
+	p = Parser({
+		"@add": "expr + expr",
+		"@sub": "expr - expr",
+		"@mul": "expr * expr",
+		"@div": "expr / expr",
+		"expr": ["add", "sub", "mul", "div", "@INT", "( expr )"],
+		"@calc$": "expr"
+	})
+
+	p.token("INT", r"\d+")
+	p.ignore(r"\s+")
+
+	p.precedence("left", ["+", "-"])
+	p.precedence("left", ["*", "/"])
+
+	return p
+
+def flat(n):
+	return " + ".join(["%d * %d - %d / 7" % (i, i + 1, i + 2) for i in range(n)])
+
+def nested(n):
+	return "(" * n + "1" + "".join([" + %d)" % i for i in range(n)])
+
+def shape(node):
+	res = []
+	stack = [(node, 0)]
+
+	while stack:
+		node, depth = stack.pop()
+		res.append((depth, node.emit, node.match))
+		stack.extend([(child, depth + 1) for child in reversed(node.children or [])])
+
+	return res
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree operator precedence benchmark")
+	ap.add_argument("-n", "--count", type=int, default=10000,
+					help="Number of terms in the flat expression (default: 10000)")
+	ap.add_argument("-d", "--depth", type=int, default=500,
+					help="Nesting depth of the nested expression (default: 500)")
+	args = ap.parse_args()
+
+	parsers = [("leftrec", leftrec()), ("precedence", precedence())]
+
+	print("%-8s %-12s %10s %14s" % ("input", "grammar", "seconds", "alternatives"))
+
+	for name, s in [("flat", flat(args.count)), ("nested", nested(args.depth))]:
+		asts = []
+
+		for grammar, p in parsers:
+			start = time.time()
+			asts.append(p.parse(s))
+			elapsed = time.time() - start
+
+			print("%-8s %-12s %10.3f %14d" % (name, grammar, elapsed,
+											p.stats["alternatives"]))
+
+		if shape(asts[0]) != shape(asts[1]):
+			print("%-8s ASTs differ!" % name)
+			sys.exit(1)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Measures parse time over growing input sizes.
+#
+# The throughput column should stay roughly constant from 10 KB up to 10 MB,
+# proving that scanning works in place and parsing time grows linearly.
+
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.setrecursionlimit(100000)
+
+from pynetree import Parser
+
+def build():
+	p = Parser("""
+		%skip /\\s+/;
+		@INT /\\d+/;
+		@IDENT /[a-z_]\\w*/;
+
+		f: INT | IDENT | '(' e ')';
+		@mul: t "*" f;
+		t: mul | f;
+		@add: e "+" t;
+		e: add | t;
+
+		@stmt: IDENT "=" e ";";
+		program$: stmt*;
+		""")
+
+	return p
+
+def generate(size):
+	line = "x%d = 1 + 23 * (foo + 456) * bar + 7890;\n"
+	chunks = []
+	length = 0
+	i = 0
+
+	while length < size:
+		chunks.append(line % i)
+		length += len(chunks[-1])
+		i += 1
+
+	return "".join(chunks)
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree input size scaling benchmark")
+	ap.add_argument("-m", "--max", type=int, default=10 * 1024 * 1024,
+					help="Maximum input size in bytes (default: 10 MB)")
+	args = ap.parse_args()
+
+	p = build()
+	size = 10 * 1024
+
+	print("%12s %10s %12s %12s %12s" % ("bytes", "seconds", "KB/s",
+										"scans", "scan hits"))
+
+	while size <= args.max:
+		s = generate(size)
+
+		start = time.time()
+		p.parse(s)
+		elapsed = time.time() - start
+
+		print("%12d %10.3f %12.1f %12d %12d" % (len(s), elapsed,
+					len(s) / 1024.0 / elapsed, p.stats["scans"], p.stats["scan_hits"]))
+		size *= 10
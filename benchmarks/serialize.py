@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Parses the program of examples/xpl.py, repeated a given number of times, and
+# compares the size and the times of saving and loading the AST by pickle as
+# a plain object graph, by pickle, which uses the binary format of the nodes,
+# and by Node.encode() and Node.decode() directly.
+
+import argparse, gc, io, os, pickle, sys, time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+
+from pynetree import Parser, Node
+
+examples = os.path.join(root, "examples")
+
+def nodes(ast):
+	"""
+	Returns the nodes of ``ast`` in pre-order, as comparable tuples.
+	"""
+	res = []
+	stack = [ast]
+
+	while stack:
+		node = stack.pop()
+		res.append((node.symbol, node.emit, node.rule, node.match))
+		stack.extend(reversed(node.children))
+
+	return res
+
+def graph(ast):
+	"""
+	Pickles ``ast`` node by node, as pickle does for objects without
+	their own reduction.
+	"""
+	f = io.BytesIO()
+	pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+	pickler.dispatch_table = {
+		Node: lambda node: (Node, (node.symbol, node.emit, None, node.rule, node._children,
+									node.source, node.start, node.end))
+	}
+	pickler.dump(ast)
+
+	return f.getvalue()
+
+def measure(function, arg, repeat):
+	"""
+	Returns the result of ``function(arg)`` and its best time of ``repeat``
+	calls, each one after a garbage collection.
+	"""
+	best = None
+
+	for i in range(repeat):
+		gc.collect()
+
+		start = time.time()
+		res = function(arg)
+		elapsed = time.time() - start
+
+		if best is None or elapsed < best:
+			best = elapsed
+
+	return res, best
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree tree serialization benchmark")
+	ap.add_argument("-n", "--count", type=int, default=1000,
+					help="Number of times the program is repeated (default: 1000)")
+	ap.add_argument("-r", "--repeat", type=int, default=5,
+					help="Number of runs of every method, the best is taken (default: 5)")
+	args = ap.parse_args()
+
+	src = open(os.path.join(examples, "xpl.py")).read()
+	grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+	program = src.split('p.parse("""')[1].split('""")')[0]
+
+	p = Parser(grammar)
+	s = "\n".join([program] * args.count)
+	ast = p.parse(s)
+	expected = nodes(ast)
+
+	methods = [
+		("pickle, graph", graph, pickle.loads),
+		("pickle", lambda ast: pickle.dumps(ast, pickle.HIGHEST_PROTOCOL), pickle.loads),
+		("encode()", Node.encode, Node.decode),
+		("encode(matches)", lambda ast: ast.encode(matches=True), Node.decode)
+	]
+
+	print("%d nodes, %d bytes of input" % (len(expected), len(s)))
+	print("%-16s %12s %10s %10s" % ("method", "bytes", "save s", "load s"))
+
+	failed = False
+
+	for method, save, load in methods:
+		data, saved = measure(save, ast, args.repeat)
+		res, loaded = measure(load, data, args.repeat)
+
+		print("%-16s %12d %10.3f %10.3f" % (method, len(data), saved, loaded))
+
+		if nodes(res) != expected:
+			print("%s: AST differs" % method)
+			failed = True
+
+	if failed:
+		sys.exit(1)
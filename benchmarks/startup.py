@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Measures the startup time for the grammar of examples/xpl.py: In-process,
+# the construction of the first and of further parsers, with and without a
+# grammar cache, and the pynetree command-line tool parsing one statement,
+# without a cache, with a cold (empty) and with a warm cache.
+
+import argparse, os, shutil, subprocess, sys, tempfile, time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+
+from pynetree import Parser
+
+examples = os.path.join(root, "examples")
+
+def best(function, repeat):
+	res = None
+
+	for i in range(repeat):
+		start = time.time()
+		function()
+		elapsed = time.time() - start
+
+		if res is None or elapsed < res:
+			res = elapsed
+
+	return res
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree startup benchmark")
+	ap.add_argument("-r", "--repeat", type=int, default=10,
+					help="Number of runs, the best is reported (default: 10)")
+	args = ap.parse_args()
+
+	src = open(os.path.join(examples, "xpl.py")).read()
+	grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+
+	tmp = tempfile.mkdtemp()
+	cache = os.path.join(tmp, "cache")
+
+	try:
+		gfile = os.path.join(tmp, "xpl.bnf")
+		f = open(gfile, "w")
+		f.write(grammar)
+		f.close()
+
+		ifile = os.path.join(tmp, "input.xpl")
+		f = open(ifile, "w")
+		f.write("x = 1;\n")
+		f.close()
+
+		print("%-24s %10s" % ("Parser()", "seconds"))
+		print("%-24s %10.4f" % ("first", best(lambda: Parser(grammar), 1)))
+		print("%-24s %10.4f" % ("again", best(lambda: Parser(grammar), args.repeat)))
+
+		def cold():
+			shutil.rmtree(cache, True)
+			Parser(grammar, cache = cache)
+
+		print("%-24s %10.4f" % ("cold cache", best(cold, args.repeat)))
+		print("%-24s %10.4f" % ("warm cache", best(lambda: Parser(grammar, cache = cache),
+													args.repeat)))
+
+		cli = [sys.executable, "-c",
+				"import sys; sys.path.insert(0, %r); import pynetree; pynetree.main()" % root]
+
+		def run(options):
+			subprocess.check_call(cli + options + [gfile, ifile], stdout=open(os.devnull, "w"))
+
+		def coldrun():
+			shutil.rmtree(cache, True)
+			run(["-c", cache])
+
+		print("")
+		print("%-24s %10s" % ("pynetree", "seconds"))
+		print("%-24s %10.4f" % ("no cache", best(lambda: run([]), args.repeat)))
+		print("%-24s %10.4f" % ("cold cache", best(coldrun, args.repeat)))
+		print("%-24s %10.4f" % ("warm cache", best(lambda: run(["-c", cache]), args.repeat)))
+
+	finally:
+		shutil.rmtree(tmp, True)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Parses a file made of the program of examples/xpl.py, repeated a given
+# number of times, at once with Parser.parse() and statement by statement with
+# Parser.parse_iter(), and compares the times and the peak memory used.
+
+import argparse, os, sys, tempfile, time, tracemalloc
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+
+from pynetree import Parser
+
+examples = os.path.join(root, "examples")
+
+def measure(function):
+	"""
+	Calls ``function`` twice, and returns its result, the time, and the peak
+	memory allocated, which is traced in the second call only.
+	"""
+	start = time.time()
+	res = function()
+	elapsed = time.time() - start
+
+	tracemalloc.start()
+
+	try:
+		function()
+		peak = tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+	return res, elapsed, peak
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree streaming benchmark")
+	ap.add_argument("-n", "--count", type=int, default=200,
+					help="Number of times the program is repeated (default: 200)")
+	ap.add_argument("-s", "--size", type=int, default=65536,
+					help="Block size of parse_iter() (default: 65536)")
+	args = ap.parse_args()
+
+	src = open(os.path.join(examples, "xpl.py")).read()
+	grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+	program = src.split('p.parse("""')[1].split('""")')[0]
+
+	p = Parser(grammar)
+
+	fd, name = tempfile.mkstemp(suffix=".xpl")
+
+	try:
+		f = os.fdopen(fd, "w")
+		f.write("\n".join([program] * args.count))
+		f.close()
+
+		def whole():
+			return len(p.parse(open(name).read()).children)
+
+		def stream():
+			return sum([len(ast.children)
+						for ast in p.parse_iter(open(name), "statement", size=args.size)])
+
+		print("%s: %d bytes" % (os.path.basename(name), os.path.getsize(name)))
+		print("%-12s %10s %10s %12s" % ("method", "records", "seconds", "peak MB"))
+
+		for method, function in [("parse", whole), ("parse_iter", stream)]:
+			count, elapsed, peak = measure(function)
+			print("%-12s %10d %10.3f %12.1f" % (method, count, elapsed, peak / 1048576.0))
+
+	finally:
+		os.unlink(name)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+# Traverses the AST of the XPL example program from examples/xpl.py,
+# repeated up to a given number of top-level statements, with
+# Parser.traverse() and with its former recursive implementation, which
+# looked up the functions by dir() on every node. Both must call the same
+# functions in the same order.
+
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.setrecursionlimit(100000)
+
+from pynetree import Parser
+
+examples = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples")
+
+class Recorder(Parser):
+	def __init__(self, grammar):
+		super(Recorder, self).__init__(grammar)
+		self.log = []
+
+	def pre_assign(self, node):
+		self.log.append(("pre_assign", node.start))
+
+	def pass_statement_0(self, node, _loopIndex):
+		self.log.append(("pass_statement_0", _loopIndex))
+
+	def pass_function_call_1(self, node, _loopIndex):
+		self.log.append(("pass_function_call_1", node.start))
+
+	def pass_arith_0_2(self, node, _loopIndex):
+		self.log.append(("pass_arith_0_2", node.start))
+
+	def post_IDENT(self, node):
+		self.log.append(("post_IDENT", node.start))
+
+	def post_expression_4(self, node):
+		self.log.append(("post_expression_4", node.start))
+
+	def post_arith(self, node):
+		self.log.append(("post_arith", node.rule, node.start))
+
+def legacy(self, node, prePrefix = "pre_", passPrefix = "pass_", postPrefix = "post_", *args, **kwargs):
+	"""
+	Parser.traverse() as it was before the dispatch tables.
+	"""
+	def perform(prefix, loop = None, *args, **kwargs):
+		if not (node.emit or node.symbol):
+			return False
+
+		if loop is not None:
+			kwargs["_loopIndex"] = loop
+
+		for x in range(0, 2):
+			if x == 0:
+				fname = "%s%s" % (prefix, node.emit or node.symbol)
+			else:
+				if node.rule is None:
+					break
+
+				fname = "%s%s_%d" % (prefix, node.emit or node.symbol, node.rule)
+
+			if fname and fname in dir(self) and callable(getattr(self, fname)):
+				getattr(self, fname)(node, *args, **kwargs)
+				return True
+
+			elif loop is not None:
+				fname += "_%d" % loop
+
+				if fname and fname in dir(self) and callable(getattr(self, fname)):
+					getattr(self, fname)(node, *args, **kwargs)
+					return True
+
+		return False
+
+	perform(prePrefix, *args, **kwargs)
+
+	for count, i in enumerate(node.children):
+		legacy(self, i, prePrefix, passPrefix, postPrefix, *args, **kwargs)
+		perform(passPrefix, loop=count, *args, **kwargs)
+
+	if not perform(postPrefix, *args, **kwargs):
+		if callable(self.emits[node.key]):
+			self.emits[node.key](node, *args, **kwargs)
+		elif self.emits[node.key]:
+			print(self.emits[node.key])
+
+def count(ast):
+	res = 0
+	stack = [ast]
+
+	while stack:
+		node = stack.pop()
+		stack.extend(node.children)
+		res += 1
+
+	return res
+
+if __name__ == "__main__":
+	ap = argparse.ArgumentParser(description="pynetree AST traversal benchmark")
+	ap.add_argument("-n", "--count", type=int, default=600,
+					help="Number of top-level statements (default: 600)")
+	args = ap.parse_args()
+
+	src = open(os.path.join(examples, "xpl.py")).read()
+	grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+	program = src.split('p.parse("""')[1].split('""")')[0]
+
+	p = Recorder(grammar)
+
+	# The example program has six top-level statements
+	ast = p.parse(program * ((args.count + 5) // 6))
+
+	# The former implementation fails on the root, as it isn't emitted
+	start = time.time()
+	for node in ast.children:
+		legacy(p, node)
+	before = time.time() - start
+	expected = p.log
+
+	p.log = []
+	start = time.time()
+	for node in ast.children:
+		p.traverse(node)
+	after = time.time() - start
+
+	print("%10s %10s %12s %12s" % ("nodes", "calls", "former", "traverse"))
+	print("%10d %10d %12.3f %12.3f" % (count(ast), len(expected), before, after))
+
+	if p.log != expected:
+		print("Function calls differ")
+		sys.exit(1)
@@ -1 +1,2 @@
-from .pynetree import main, Parser, ParseError, Node
+from .pynetree import main, Parser, ParseSession, ParseError, CallableTokenError, Node, NodeReader, FlatTree, \
+	CompiledGrammar, TokenStream, Memo, DictMemo, ArrayMemo, WindowMemo
@@ -4,13 +4,18 @@
 pynetree: A light-weight parsing toolkit written in pure Python.
 """
 
-__version__ = "0.6"
+__version__ = "0.7"
 __license__ = "MIT"
 __status__ = "Beta"
 __author__ = "Jan Max Meyer"
 __copyright__ = "Copyright 2015-2017 by Jan Max Meyer, Phorward Software Technologies"
 
-import re
+import array, os, re
+
+try:
+	from re import _parser as sre_parse
+except ImportError:
+	import sre_parse
 
 class GoalSymbolNotDefined(Exception):
 	def __init__(self):
@@ -28,32 +33,86 @@ class MultipleDefinitionError(Exception):
 			"Multiple definition of: '%s'" % name)
 
 class ParseError(Exception):
-	def __init__(self, s, offset):
-		row = s.count("\n", 0, offset) + 1
+	def __init__(self, s, offset, start = 0, line = 1, column = 1):
+		# s may be a part of the input, starting at offset start, line
+		# and column.
+		row = s.count("\n", 0, offset) + line
 		col = s.rfind("\n", 0, offset)
-		col = (offset + 1) if col < 1 else offset - col
+		col = (offset + column) if col < 0 else offset - col
 
 		super(ParseError, self).__init__(
 			"Parse error at line %d, column %d: >%s<" % (row, col, s[offset:]))
 
-		self.offset = offset
+		self.offset = start + offset
 		self.line = row
 		self.column = col
 
+	def __reduce__(self):
+		# Rebuilt from the input behind the error, starting at its offset,
+		# line and column
+		msg = self.args[0]
+		return (ParseError, (msg[msg.index(": >") + 3:-1], 0,
+								self.offset, self.line, self.column))
+
+class CallableTokenError(Exception):
+	def __init__(self, name, feature, what = "token"):
+		super(CallableTokenError, self).__init__(
+			"Callable %s '%s' can't be used with %s" % (what, name, feature))
+
 class Node(object):
 	"""
 	This is an AST node.
+
+	Nodes created by the parser don't copy their match: They refer to the
+	input and keep the start and end offsets of the match, and :attr:`match`
+	slices it on access.
 	"""
 
-	def __init__(self, symbol = None, emit = None, match = None, rule = None, children = None):
+	__slots__ = ("symbol", "emit", "rule", "source", "start", "end", "_children")
+
+	def __init__(self, symbol = None, emit = None, match = None, rule = None, children = None,
+					source = None, start = 0, end = 0):
 		self.symbol = symbol
 		self.emit = emit
 		self.rule = rule
-		self.key = self.symbol if self.rule is None \
-					else (self.symbol, self.rule)
 
-		self.match = match
-		self.children = children or []
+		self.source = source
+		self.start = start
+		self.end = end
+
+		if match is not None:
+			self.match = match
+
+		self._children = children or None
+
+	@property
+	def key(self):
+		return self.symbol if self.rule is None else (self.symbol, self.rule)
+
+	@property
+	def match(self):
+		if self.source is None:
+			return None
+
+		return self.source[self.start:self.end]
+
+	@match.setter
+	def match(self, match):
+		self.source = match
+		self.start = 0
+		self.end = len(match) if match is not None else 0
+
+	@property
+	def children(self):
+		# Leaves get their list of children on first access only
+		if self._children is None:
+			self._children = []
+
+		return self._children
+
+	@children.setter
+	def children(self, children):
+		self._children = children
 
 	def __str__(self):
 		s = self.emit or self.symbol or ""
@@ -61,7 +120,7 @@ class Node(object):
 		if self.rule is not None:
 			s += "[%d]" % self.rule
 
-		if not self.children and self.match is not None:
+		if not self._children and self.source is not None:
 			s += " (%s)" % self.match
 
 		return s
@@ -82,9 +141,9 @@ class Node(object):
 					child at position `idx` that matches `symbol`. It returns None if there is no child.
 		"""
 		if idx < 0:
-			return [child for child in self.children if child.symbol == symbol]
+			return [child for child in self._children or () if child.symbol == symbol]
 
-		for child in self.children:
+		for child in self._children or ():
 			if child.symbol == symbol:
 				if idx == 0:
 					return child
@@ -93,686 +152,4555 @@ class Node(object):
 
 		return None
 
-	def dump(self, level=0):
-		if self.symbol or self.emit:
-			print("%s%s" % (level * " ", str(self)))
-			level += 1
+	def dump(self, level = 0, f = None, format = "text", match = True, offsets = False):
+		"""
+		Writes the tree to a file, by default to stdout.
+
+		The tree is walked without recursion, and the output is written in
+		blocks of many nodes.
+
+		:param level: The indentation level of the node.
+		:param f: The file object to write to.
+		:param format: "text" writes one line per node, indented by its
+			depth, "json" nested JSON objects with the attributes of the
+			nodes, and "sexpr" S-expressions. Nodes having neither symbol
+			nor emit are left out of "text" and "sexpr", their children
+			take their places.
+		:param match: Include the matches of leaves.
+		:param offsets: Include the start and end offsets of the matches.
+		"""
+		import sys
 
-		for child in self.children:
-			child.dump(level)
+		if format not in ("text", "json", "sexpr"):
+			raise ValueError("Unknown output format '%s'" % format)
 
-class Parser(object):
+		if f is None:
+			f = sys.stdout
+
+		asjson = format == "json"
+		astext = format == "text"
+
+		if asjson:
+			from json.encoder import encode_basestring_ascii as quote
+		else:
+			def quote(s):
+				return '"%s"' % s.replace("\\", "\\\\").replace('"', '\\"')
+
+		atoms = {}
+		newline = ""
+		out = []
+		stack = [(self, level)]
+
+		while stack:
+			item = stack.pop()
+
+			# Closing brackets and separators are put on the stack as strings
+			if not isinstance(item, tuple):
+				out.append(item)
+				continue
+
+			node, level = item
+			children = node._children
+
+			if asjson:
+				fields = []
+
+				if node.symbol is not None:
+					fields.append('"symbol":' + quote(node.symbol))
+				if node.emit is not None:
+					fields.append('"emit":' + quote(node.emit))
+				if node.rule is not None:
+					fields.append('"rule":%d' % node.rule)
+
+				if node.source is not None:
+					if match and not children:
+						fields.append('"match":' + quote(node.match))
+					if offsets:
+						fields.append('"start":%d,"end":%d' % (node.start, node.end))
+
+				if children:
+					fields.append('"children":[')
+					out.append("{" + ",".join(fields))
+
+					items = [","] * (2 * len(children) - 1)
+					items[::2] = [(child, level) for child in children]
+
+					stack.append("]}")
+					stack.extend(reversed(items))
+				else:
+					out.append("{" + ",".join(fields) + "}")
+
+			elif node.symbol or node.emit:
+				name = node.emit or node.symbol
+
+				if astext:
+					s = level * " " + name
+
+					if node.rule is not None:
+						s += "[%d]" % node.rule
+
+					if node.source is not None:
+						if match and not children:
+							s += " (%s)" % node.match
+						if offsets:
+							s += " @%d:%d" % (node.start, node.end)
+
+					out.append(s + "\n")
+
+				else:
+					atom = atoms.get(name)
+					if atom is None:
+						atom = atoms[name] = quote(name) if not name \
+										or re.search(r"[\s()\";']", name) else name
+
+					s = "(" + atom
+
+					if node.rule is not None:
+						s += " :rule %d" % node.rule
+
+					if node.source is not None:
+						if offsets:
+							s += " :start %d :end %d" % (node.start, node.end)
+						if match and not children:
+							s += " " + quote(node.match)
+
+					out.append(newline + level * " " + s)
+					newline = "\n"
+
+					if children:
+						stack.append(")")
+					else:
+						out.append(")")
+
+				level += 1
+
+			if children and not asjson:
+				stack.extend([(child, level) for child in reversed(children)])
+
+			if len(out) >= 4096:
+				f.write("".join(out))
+				del out[:]
+
+		if not astext:
+			out.append("\n")
+
+		f.write("".join(out))
+
+	def __reduce__(self):
+		# Trees are pickled in their binary format, which is built without
+		# recursion, so that they can be nested arbitrarily deep. Emits
+		# that are no strings, like functions, are pickled on their own,
+		# with the pre-order index of their node.
+		objects = []
+		data = self._encode(False, objects)
+
+		if objects:
+			return (_nodes, (data, tuple(objects)))
+
+		return (_nodes, (data, ))
+
+	def encode(self, matches = False):
+		"""
+		Serializes the tree into the compact binary format read by
+		:class:`pynetree.NodeReader` and :meth:`decode`.
+
+		The data starts with a versioned header, followed by a table of
+		the symbol and emit strings, a table of texts and one fixed-size
+		row per node in pre-order. A row holds indexes into the tables, the
+		rule, the offsets, the number of children and the number of
+		descendants of its node; the width of every column is chosen by
+		its largest value.
+
+		:param matches: Store the matches of the nodes instead of the inputs
+			they refer to. Equal matches are stored once, which is smaller
+			for repetitive inputs or trees covering little of their input,
+			but the decoded nodes start their matches at offset 0.
+		"""
+		return self._encode(matches)
+
+	def _encode(self, matches, objects = None):
+		"""
+		Implements :meth:`encode`. Emits that are no strings are added to
+		``objects`` as tuples of the pre-order index of their node and the
+		emit, and left out of the data, if ``objects`` is given.
+		"""
+		import struct
+
+		texttypes = (bytes, type(u""))
+
+		strings = {}
+		texts = {}
+		rows = []
+		stack = [self]
+
+		while stack:
+			node = stack.pop()
+			children = node._children or ()
+			if children:
+				stack.extend(children[::-1])
+
+			symbol = 0 if node.symbol is None else strings.setdefault(node.symbol, len(strings)) + 1
+
+			if node.emit is None:
+				emit = 0
+			elif objects is not None and not isinstance(node.emit, texttypes):
+				objects.append((len(rows), node.emit))
+				emit = 0
+			else:
+				emit = strings.setdefault(node.emit, len(strings)) + 1
+			rule = 0 if node.rule is None else node.rule + 1
+
+			if node.source is None:
+				rows.append([symbol, emit, rule, 0, node.start, node.end - node.start,
+								len(children), 0])
+			elif matches:
+				match = node.match
+				rows.append([symbol, emit, rule, texts.setdefault(match, len(texts)) + 1,
+								0, len(match), len(children), 0])
+			else:
+				rows.append([symbol, emit, rule, texts.setdefault(node.source, len(texts)) + 1,
+								node.start, node.end - node.start, len(children), 0])
+
+		# The subtrees of the children of a node follow it in pre-order, so
+		# walking backwards, their sizes are on top of the stack.
+		sizes = []
+
+		for row in reversed(rows):
+			count = row[6]
+			if count:
+				row[7] = sum(sizes[-count:])
+				del sizes[-count:]
+
+			sizes.append(row[7] + 1)
+
+		layout = "<"
+		for i in range(8):
+			top = max([row[i] for row in rows])
+			layout += "B" if top < 0x100 else "H" if top < 0x10000 \
+						else "I" if top < 0x100000000 else "Q"
+
+		def blob(value):
+			if callable(value):
+				raise CallableTokenError(getattr(value, "__name__", value),
+											"serialized trees", "emit")
+
+			if not isinstance(value, bytes):
+				value = value.encode("utf-8")
+
+			return value
+
+		out = [NodeReader.MAGIC,
+				struct.pack("<BBB", NodeReader.VERSION, 1 if matches else 0, len(layout)),
+				layout.encode("ascii"),
+				struct.pack("<IIQ", len(strings), len(texts), len(rows))]
+
+		for table, size in ((strings, "<I"), (texts, "<Q")):
+			for value in sorted(table, key=table.get):
+				value = blob(value)
+				out.append(struct.pack(size, len(value)))
+				out.append(value)
+
+		pack = struct.Struct(layout).pack
+		out.extend([pack(*row) for row in rows])
+
+		return b"".join(out)
+
+	@staticmethod
+	def decode(data):
+		"""
+		Restores a tree from the output of :meth:`encode`.
+
+		:param data: The data, or a binary file to read it from.
+		"""
+		return NodeReader(data).tree()
+
+def _nodes(data, objects = ()):
 	"""
-	The main parser class that implements a pynetree parser.
+	Rebuilds the tree pickled by :meth:`Node.__reduce__`, and sets the
+	emits in ``objects`` by the pre-order index of their node.
+	"""
+	tree = NodeReader(data).tree()
+	if not objects:
+		return tree
 
-	The class provides functions for defining the grammar,
-	parsing input, dumping and traversing the resulting parse
-	tree or abstract syntax tree.
+	objects = dict(objects)
+	index = 0
+	stack = [tree]
+
+	while stack:
+		node = stack.pop()
+
+		if index in objects:
+			node.emit = objects[index]
+
+		index += 1
+
+		if node._children:
+			stack.extend(node._children[::-1])
+
+	return tree
+
+class NodeReader(object):
 	"""
-	AUTOTOKNAME = "T$%03d"
+	Reads a tree serialized by :meth:`pynetree.Node.encode` node by node,
+	without building it.
+
+	The tables of strings and texts are read on construction. :meth:`read`
+	then returns the nodes in pre-order as tuples of the symbol, emit, rule,
+	source, start and end of the node, its number of children and its
+	number of descendants. :meth:`skip` passes over the descendants of the
+	node read last, and :meth:`tree` builds the next subtree.
+	"""
+
+	MAGIC = b"PYNT"
+	VERSION = 1
 
-	def __init__(self, grm, dump = False):
+	def __init__(self, data):
 		"""
-		Constructs a new pynetree Parser object.
+		:param data: The data, or a binary file to read it from.
+		"""
+		import io, struct
 
-		:param grm: The grammar to be used; This can either be a dictionary of
-					symbols and relating productions, or a string that is
-					expressed in the BNF-styled grammar definition parser.
-		:type grm: dict | str
+		self.file = data if hasattr(data, "read") else io.BytesIO(data)
 
-		:param dump: Dump parsed grammar (only when grm was a string)
-		"""
-		self.grammar = {}
-		self.goal = None
-		self.tokens = {}
-		self.ignores = []
-		self.emits = {}
+		if self.file.read(len(self.MAGIC)) != self.MAGIC:
+			raise ValueError("Data is not a serialized tree")
 
-		def uniqueName(n):
-			"""
-			Generates a unique symbol name from ``n``, by adding
-			single-quotation characters to the end of ``n`` until
-			no symbol with such a name exists in the grammar.
-			"""
-			while n in self.tokens.keys():
-				n += "'"
+		version, flags, size = struct.unpack("<BBB", self._read(3))
+		if version != self.VERSION:
+			raise ValueError("Unsupported tree format version %d" % version)
 
-			while n in self.grammar.keys():
-				n += "'"
+		#: Whether the texts are the matches of the nodes, see :meth:`pynetree.Node.encode`.
+		self.matches = bool(flags & 1)
+		self.row = struct.Struct(self._read(size).decode("ascii"))
 
-			return n
+		strings, texts, self.remaining = struct.unpack("<IIQ", self._read(16))
 
-		def generateModifier(nonterm, sym, mod):
-			if mod in ["*", "+"]:
-				oneOrMore = uniqueName(nonterm)
-				self.grammar[oneOrMore] = [[oneOrMore, sym], [sym]]
-				sym = oneOrMore
+		def table(count, size):
+			res = []
+			for i in range(count):
+				value = self._read(struct.unpack(size, self._read(struct.calcsize(size)))[0])
+				res.append(value if str is bytes else value.decode("utf-8"))
 
-			if mod in ["?", "*"]:
-				oneOrNone = uniqueName(nonterm)
-				self.grammar[oneOrNone] = [[sym], []]
-				sym = oneOrNone
+			return res
 
-			return sym
+		self.strings = [None] + table(strings, "<I")
+		self.texts = [None] + table(texts, "<Q")
+		self.last = None
 
+	def _read(self, size):
+		data = self.file.read(size)
+		if len(data) != size:
+			raise ValueError("Serialized tree is truncated")
 
-		if isinstance(grm, dict):
-			# Rewrite grammar modifiers and goal according provided grammar
-			for n, np in grm.items():
-				if n.startswith("@"):
-					n = n[1:]
-					self.emits[n] = None
+		return data
 
-				if n.endswith("$"):
-					if n in self.emits.keys():
-						self.emits[n[:-1]] = self.emits[n]
-						del self.emits[n]
+	def _node(self, row):
+		symbol, emit, rule, text, start, length, count, size = row
+		return (self.strings[symbol], self.strings[emit], rule - 1 if rule else None,
+					self.texts[text], start, start + length, count, size)
 
-					n = n[:-1]
-					self.goal = n
+	def __iter__(self):
+		while True:
+			node = self.read()
+			if node is None:
+				break
 
-				if not np:
-					self.grammar[n] = [""]
-				elif not isinstance(np, list):
-					self.grammar[n] = [np]
-				else:
-					self.grammar[n] = np[:]
+			yield node
 
-				np = self.grammar[n] = [x.split() for x in self.grammar[n]]
+	def read(self):
+		"""
+		Returns the next node in pre-order, or None after the last one.
+		"""
+		if not self.remaining:
+			return None
 
-				rnp = []
-				for p in np:
+		self.remaining -= 1
+		self.last = self._node(self.row.unpack(self._read(self.row.size)))
+		return self.last
 
-					rp = []
-					for sym in p:
-						if len(sym) > 1 and sym.startswith("@"):
-							sym = sym[1:]
-							self.emits[sym] = None
+	def skip(self):
+		"""
+		Skips the descendants of the node read last.
+		"""
+		if not self.last or not self.last[7]:
+			return
 
-						if any([len(sym) > 1 and sym.endswith(x)
-						                            for x in "*+?"]):
-							sym = generateModifier(n, sym[:-1], sym[-1:])
+		count = self.last[7]
+		self.remaining -= count
+		self.last = None
 
-						rp.append(sym)
+		try:
+			self.file.seek(count * self.row.size, 1)
+		except (AttributeError, IOError, ValueError):
+			self._read(count * self.row.size)
 
-					rnp.append(rp)
+	def tree(self):
+		"""
+		Builds the next node and its descendants as a tree of
+		:class:`pynetree.Node` objects, or returns None after the last node.
+		"""
+		import itertools
 
-				self.grammar[n] = rnp
+		if not self.remaining:
+			return None
+
+		row = self.row.unpack(self._read(self.row.size))
+		count = row[7]
+
+		self.remaining -= count + 1
+		self.last = None
+
+		data = self._read(count * self.row.size)
+
+		if hasattr(self.row, "iter_unpack"):
+			rows = self.row.iter_unpack(data)
 		else:
-			# Construct a parser for the BNF input language.
-			bnfparser = Parser({
-				"opt_ident": ["IDENT", ""],
-				"opt_emit": ["EMIT", ""],
+			unpack = self.row.unpack_from
+			rows = (unpack(data, offset) for offset in range(0, len(data), self.row.size))
 
-				"inline": ["EMIT opt_ident ( alternation )", "( alternation )"],
+		strings = self.strings
+		texts = self.texts
 
-				"symbol": ["IDENT", "STRING", "TOKEN", "REGEX", "CCL", "inline"],
+		root = None
+		stack = []	# parents, and their number of children still missing
 
-				"mod_kleene": "symbol *",
-				"mod_positive": "symbol +",
-				"mod_optional": "symbol ?",
-				"modifier": ["mod_kleene", "mod_positive", "mod_optional", "symbol"],
+		for symbol, emit, rule, text, start, length, count, size in itertools.chain((row, ), rows):
+			node = Node(strings[symbol], strings[emit], None, rule - 1 if rule else None, None,
+						texts[text], start, start + length)
 
-				"sequence": ["sequence modifier", "modifier"],
+			if stack:
+				parent = stack[-1]
+				parent[0].children.append(node)
 
-				"production": ["sequence", ""],
+				parent[1] -= 1
+				if not parent[1]:
+					stack.pop()
+			else:
+				root = node
 
-				"alternation": ["alternation | production", "production"],
+			if count:
+				stack.append([node, count])
 
-				"nontermflag": ["GOAL"], #fixme sticky
-				"nontermflags": ["nontermflags nontermflag", "nontermflag", ""],
-				"nontermdef": ["opt_emit IDENT nontermflags : alternation ;" ],
+		return root
 
-				"termsym": ["STRING", "REGEX", "CCL", "IDENT"],
-				"termdef": ["opt_emit IDENT termsym ;", "IGNORE termsym ;"] ,
+class FlatTree(object):
+	"""
+	An AST stored as parallel arrays, with one entry per node.
+
+	Nodes are referred to by their index; the root has index 0, and all
+	nodes are stored in pre-order. Per node, the array :attr:`kind` holds
+	an index into the table :attr:`kinds` of distinct ``(symbol, emit,
+	rule)`` tuples, and :attr:`start` and :attr:`end` the offsets of the
+	match in :attr:`source`. :attr:`stop` holds the index following the
+	subtree of a node, so its first child is the next node, and every
+	child is followed by the stop of the previous one. Missing offsets
+	are -1.
+
+	Flat trees are returned by :meth:`pynetree.Parser.parse` when called
+	with ``tree="flat"``, and can be passed around as raw buffers by
+	:meth:`buffers` and :meth:`frombuffers`.
+	"""
 
-				"definition": ["nontermdef", "termdef"],
-				"definitions": ["definitions definition", "definition"],
-				"grammar$": "definitions"})
+	# Array typecodes
+	layout = (("kind", "h"), ("start", "i"), ("end", "i"), ("stop", "i"))
 
-			bnfparser.ignore(r"\s+")
-			bnfparser.ignore(r"//[^\n]*\n")
-			bnfparser.ignore(r"/\*([^*]|\*[^/])*\*/")
+	def __init__(self, kinds, source):
+		self.kinds = kinds		# kind ID -> (symbol name, emit value, rule)
+		self.source = source
 
-			bnfparser.token("IDENT", r"\w+")
-			bnfparser.token("CCL", r"\[[^\]]*\]")
-			bnfparser.token("STRING", r"'[^']*'")
-			bnfparser.token("TOKEN", r'"[^"]*"')
-			bnfparser.token("REGEX", r"/(\\.|[^\\/])*/")
+		for name, typecode in self.layout:
+			if name == "kind" and len(kinds) >= 2 ** 15:
+				typecode = "i"
+			elif name in ["start", "end"] and len(source) >= 2 ** 31:
+				typecode = "q"
 
-			bnfparser.token("GOAL", "$", static=True)
-			bnfparser.token("EMIT", "@", static=True)
-			bnfparser.token("IGNORE", r"%(ignore|skip)")
+			setattr(self, name, array.array(typecode))
 
-			bnfparser.emit(["IDENT", "STRING", "TOKEN", "REGEX", "CCL",
-							"GOAL", "EMIT", "IGNORE"])
-			bnfparser.emit(["inline", "mod_kleene", "mod_positive",
-			                    "mod_optional", "production", "nontermdef",
-									"termdef", "grammar"])
+	def __len__(self):
+		return len(self.kind)
 
-			ast = bnfparser.parse(grm)
-			if not ast:
-				raise SyntaxError()
+	@classmethod
+	def build(cls, root, symbols, source):
+		"""
+		Builds a flat tree from nested records ``(symbol, emit, rule, start,
+		end, children)``, where ``symbol`` is a symbol ID from
+		``symbols`` or -1, and ``children`` is a list of records or None.
+		"""
+		kinds = []
+		kindids = {}
 
-			def buildSymbol(nonterm, symdef):
-				"""
-				AST traversal function for symbol level in the BNF-grammar.
-				"""
+		tree = cls(kinds, source)
 
-				if symdef.symbol.startswith("mod_"):
-					sym = buildSymbol(nonterm, symdef.children[0])
-					sym = generateModifier(nonterm, sym,
-										   {"kleene":"*",
-											"positive":"+",
-											"optional":"?"}[symdef.symbol[4:]])
-				elif symdef.symbol == "inline":
-					sym = uniqueName(nonterm)
-					self.grammar[sym] = []
-					buildNonterminal(sym, symdef.select("production"))
+		kind = tree.kind
+		start = tree.start
+		end = tree.end
+		stop = tree.stop
+
+		# Records are numbered in pre-order; the stop of a node is set by
+		# a (None, idx) entry, which is popped after its subtree.
+		stack = [(root, None)]
+
+		while stack:
+			record, idx = stack.pop()
+
+			if record is None:
+				stop[idx] = len(kind)
+				continue
+
+			key = (record[0], record[1], record[2])
+
+			kid = kindids.get(key)
+			if kid is None:
+				kid = kindids[key] = len(kinds)
+				kinds.append((symbols[record[0]] if record[0] >= 0 else None,
+								record[1], record[2]))
+
+				if kid == 2 ** 15 and kind.typecode == "h":
+					kind = tree.kind = array.array("i", kind)
+
+			idx = len(kind)
+
+			kind.append(kid)
+			start.append(record[3])
+			end.append(record[4])
+			stop.append(idx + 1)
+
+			if record[5]:
+				stack.append((None, idx))
+				stack.extend([(item, None) for item in reversed(record[5])])
+
+		return tree
+
+	def name(self, idx):
+		"""
+		Returns the symbol name of node ``idx``.
+		"""
+		return self.kinds[self.kind[idx]][0]
+
+	def value(self, idx):
+		"""
+		Returns the emit value of node ``idx``.
+		"""
+		return self.kinds[self.kind[idx]][1]
+
+	def rule(self, idx):
+		"""
+		Returns the rule index of node ``idx``, if it was emitted by a rule.
+		"""
+		return self.kinds[self.kind[idx]][2]
+
+	def match(self, idx):
+		"""
+		Returns the match of node ``idx``, or None if it has none.
+		"""
+		if self.start[idx] < 0:
+			return None
+
+		return self.source[self.start[idx]:self.end[idx]]
+
+	def key(self, idx):
+		"""
+		Returns the key of node ``idx``, as in :attr:`pynetree.Node.key`.
+		"""
+		symbol, emit, rule = self.kinds[self.kind[idx]]
+
+		if rule is None:
+			return symbol
+
+		return (symbol, rule)
+
+	def children(self, idx = 0):
+		"""
+		Yields the indexes of the children of node ``idx``.
+		"""
+		end = self.stop[idx]
+		idx += 1
+
+		while idx < end:
+			yield idx
+			idx = self.stop[idx]
+
+	def check(self, idx, symbol):
+		return self.name(idx) == symbol
+
+	def contains(self, idx, symbol):
+		return self.select(idx, symbol, 0) is not None
+
+	def select(self, idx, symbol, nth = -1):
+		"""
+		Select children by symbol from node ``idx``.
+
+		:param idx: Index of the node.
+		:param symbol: Symbol to be matched.
+		:param nth: The desired index of the symbol.
+		:return: If nth is < 0, the function returns a list of indexes of
+			children matching symbol, else it returns the index of the child
+			at position `nth` that matches `symbol`. It returns None if there
+			is no child.
+		"""
+		res = [child for child in self.children(idx) if self.name(child) == symbol]
+
+		if nth < 0:
+			return res
+
+		return res[nth] if nth < len(res) else None
+
+	def node(self, idx = 0):
+		"""
+		Converts the subtree of node ``idx`` into a tree of
+		:class:`pynetree.Node` objects.
+		"""
+		nodes = {}
+
+		for sub in range(self.stop[idx] - 1, idx - 1, -1):
+			children = [nodes.pop(child) for child in self.children(sub)]
+			symbol, emit, rule = self.kinds[self.kind[sub]]
+
+			if self.start[sub] < 0:
+				node = Node(symbol, emit, None, rule, children)
+			else:
+				node = Node(symbol, emit, None, rule, children,
+							self.source, self.start[sub], self.end[sub])
+
+			nodes[sub] = node
+
+		return nodes[idx]
+
+	def dump(self, idx = 0, level = 0):
+		stack = [(idx, level)]
+
+		while stack:
+			idx, level = stack.pop()
+			symbol, emit, rule = self.kinds[self.kind[idx]]
+
+			if symbol is not None or emit is not None:
+				s = emit or symbol or ""
+
+				if rule is not None:
+					s += "[%d]" % rule
+
+				if self.stop[idx] == idx + 1 and self.start[idx] >= 0:
+					s += " (%s)" % self.match(idx)
+
+				print("%s%s" % (level * " ", s))
+				level += 1
+
+			stack.extend([(child, level) for child in reversed(list(self.children(idx)))])
+
+	def buffers(self):
+		"""
+		Returns the node arrays as a dict of names and bytes.
+		"""
+		buffers = {}
+
+		for name, typecode in self.layout:
+			values = getattr(self, name)
+			buffers[name] = values.tobytes() if hasattr(values, "tobytes") else values.tostring()
+
+		return buffers
+
+	@classmethod
+	def frombuffers(cls, kinds, source, buffers):
+		"""
+		Restores a flat tree from the output of :meth:`buffers`.
+		"""
+		tree = cls(kinds, source)
+
+		for name, typecode in cls.layout:
+			values = getattr(tree, name)
+			if hasattr(values, "frombytes"):
+				values.frombytes(buffers[name])
+			else:
+				values.fromstring(buffers[name])
+
+		return tree
+
+class TokenStream(object):
+	"""
+	A pre-tokenized input.
+
+	The tokens are stored as parallel arrays of symbol IDs and start/end
+	offsets into ``source``. Token streams are created by
+	:meth:`pynetree.Parser.tokenize` and can be passed to
+	:meth:`pynetree.Parser.parse` instead of a string.
+	"""
+
+	def __init__(self, source):
+		self.source = source
+		self.kinds = array.array("i")
+		self.starts = array.array("l")
+		self.ends = array.array("l")
+
+	def __len__(self):
+		return len(self.kinds)
+
+	def append(self, kind, start, end):
+		"""
+		Appends a token of symbol ID ``kind`` spanning ``start`` to ``end``.
+		"""
+		self.kinds.append(kind)
+		self.starts.append(start)
+		self.ends.append(end)
+
+class CompiledGrammar(object):
+	"""
+	Frozen representation of a parser's grammar, tokens, ignores and emits.
+
+	All symbols are numbered by dense integer IDs, and every rule is
+	translated into a tuple of items ``(kind, symbol, emitted)``, so the
+	parsing engine gets along with index lookups only. Objects of this class
+	are constructed by :meth:`pynetree.Parser.compile`.
+	"""
+
+	# Symbol kinds
+	NONTERM = 0
+	STRING = 1
+	REGEX = 2
+	CALLABLE = 3
+	MARK = 4	# offset of an inlined nonterminal, see optimize()
+
+	def __init__(self, parser):
+		self.names = []		# symbol ID -> symbol name
+		self.ids = {}		# symbol name -> symbol ID
+		self.kinds = []		# symbol ID -> symbol kind
+		self.tokens = []	# symbol ID -> token definition, None on nonterminals
+		self.emitted = []	# symbol ID -> True if symbol is emitted
+		self.emits = []		# symbol ID -> emit value
+		self.actions = []	# symbol ID -> reduction action
+		self.ruleactions = {}	# (nonterminal ID, rule index) -> reduction action
+		self.rules = []		# nonterminal ID -> list of (items, emitted, emit)
+		self.precedence = []	# symbol ID -> (level, associativity) of operators
+
+		for name, token in parser.tokens.items():
+			if isinstance(token, str):
+				self.symbol(name, self.STRING, token)
+			elif callable(token):
+				self.symbol(name, self.CALLABLE, token)
+			else:
+				self.symbol(name, self.REGEX, token)
+
+		# Tokens take precedence over nonterminals with the same name
+		for name in parser.grammar.keys():
+			if name not in self.ids.keys():
+				self.symbol(name, self.NONTERM)
+
+		for name in list(self.names):
+			if name in parser.emits.keys():
+				self.emitted[self.ids[name]] = True
+				self.emits[self.ids[name]] = parser.emits[name]
+
+		for name, action in parser.actions.items():
+			if isinstance(name, tuple):
+				self.ruleactions[(self.ids[name[0]], name[1])] = action
+			else:
+				self.actions[self.ids[name]] = action
+
+		for name, prods in parser.grammar.items():
+			if self.kinds[self.ids[name]] != self.NONTERM:
+				continue
+
+			rules = self.rules[self.ids[name]] = []
+
+			for count, rule in enumerate(prods):
+				items = []
+
+				for sym in rule:
+					# Unknown symbols are literal terminals
+					if sym not in self.ids.keys():
+						self.symbol(sym, self.STRING, sym)
+
+					sid = self.ids[sym]
+					items.append((self.kinds[sid], sid, self.emitted[sid]))
+
+				if (name, count) in parser.emits.keys():
+					rules.append((tuple(items), True, parser.emits[(name, count)]))
+				else:
+					rules.append((tuple(items), False, None))
+
+		self.ignores = [self.ids[name] for name in parser.ignores]
+		self.skip = self.fuse(self.ignores)
+
+		# Literal terminals by their first character, longest first, so all
+		# literals matching at an offset are found by one probe.
+		self.literals = {}
+
+		for sid, kind in enumerate(self.kinds):
+			if kind == self.STRING and self.tokens[sid]:
+				self.literals.setdefault(self.tokens[sid][0], []).append(
+					(self.tokens[sid], sid))
+
+		for literals in self.literals.values():
+			literals.sort(key=lambda literal: -len(literal[0]))
+
+		for name, precedence in parser.precedences.items():
+			if name in self.ids.keys():
+				self.precedence[self.ids[name]] = precedence
+
+		self.lexer = None
+		self.goal = self.ids[parser.goal]
+		self.mark = None	# symbol ID of inlined nonterminal offsets
+		self.silent = set()	# nonterminals whose offsets aren't recorded
+
+		self.analyze()
+
+		if parser.optimize:
+			self.optimize(parser.memos)
+
+		for name, memoize in parser.memos.items():
+			sid = self.ids[name]
+			if not self.leftrec[sid]:
+				self.memoize[sid] = memoize
+
+	def analyze(self):
+		"""
+		Computes nullability and FIRST sets of all nonterminals and rules.
+
+		The FIRST set of a rule is the set of terminal IDs that can be
+		scanned first when the rule is entered. They are used to set up
+		dispatch tables that select only the viable rules of a nonterminal
+		by the next input character, or the next token kind in token mode.
+		"""
+		self.nullable = [kind == self.MARK for kind in self.kinds]
+		self.first = [set() if kind in [self.NONTERM, self.MARK] else set([sid])
+						for sid, kind in enumerate(self.kinds)]
+
+		changed = True
+		while changed:
+			changed = False
+
+			for nterm, rules in enumerate(self.rules):
+				if rules is None:
+					continue
+
+				for items, emitted, emit in rules:
+					nullable = True
+
+					for kind, sym, emitted in items:
+						if not self.first[sym] <= self.first[nterm]:
+							self.first[nterm] |= self.first[sym]
+							changed = True
+
+						if not self.nullable[sym]:
+							nullable = False
+							break
+
+					if nullable and not self.nullable[nterm]:
+						self.nullable[nterm] = changed = True
+
+		# Per rule nullability and FIRST set
+		self.rulefirst = []
+
+		for rules in self.rules:
+			if rules is None:
+				self.rulefirst.append(None)
+				continue
+
+			firsts = []
+			for items, emitted, emit in rules:
+				first = set()
+
+				for kind, sym, emitted in items:
+					first |= self.first[sym]
+					if not self.nullable[sym]:
+						firsts.append((False, first))
+						break
+				else:
+					firsts.append((True, first))
+
+			self.rulefirst.append(firsts)
+
+		self.starters = [None] * len(self.names)
+		self.dispatch = [{} for sid in self.names]
+		self.tdispatch = [{} for sid in self.names]
+
+		# Operator nonterminals, parsed by precedence climbing
+		self.operators = [None] * len(self.names)
+
+		for nterm, rules in enumerate(self.rules):
+			if rules is not None:
+				self.operators[nterm] = self.binaries(nterm)
+
+		self.leftrec = self.cycles()
+
+		# Operand rules must not be left-recursive themselves
+		if any([self.leftrec[nterm] for nterm, ops in enumerate(self.operators) if ops]):
+			for nterm, ops in enumerate(self.operators):
+				if ops and self.leftrec[nterm]:
+					self.operators[nterm] = None
+
+			self.leftrec = self.cycles()
+
+		# Memoize left-recursive nonterminals and those referenced from
+		# several places, except for trivial wrappers of single terminals.
+		# Only references from nonterminals reachable from the goal count,
+		# so rules left behind by the optimizer are ignored.
+		reachable = set([self.goal])
+		todo = [self.goal]
+		refs = [0] * len(self.names)
+
+		while todo:
+			for items, emitted, emit in self.rules[todo.pop()] or ():
+				for kind, sym, emitted in items:
+					refs[sym] += 1
+
+					if kind == self.NONTERM and sym not in reachable:
+						reachable.add(sym)
+						todo.append(sym)
+
+		self.memoize = [kind != self.NONTERM for kind in self.kinds]
+
+		for nterm, rules in enumerate(self.rules):
+			if rules is None:
+				continue
+
+			trivial = all([len(items) <= 1
+								and all([kind != self.NONTERM for kind, sym, emitted in items])
+							for items, emitted, emit in rules])
+
+			self.memoize[nterm] = bool(self.leftrec[nterm]
+									or (refs[nterm] > 1 and not trivial))
+
+	def optimize(self, memos = None):
+		"""
+		Rewrites the rules to do less work at parse time, without changing
+		the resulting ASTs:
+
+		- Nonterminals with only one rule are inlined into the rules using
+		  them, and nonterminals used as the only item of a rule are replaced
+		  by their alternatives. This affects nonterminals that are not
+		  memoized anyway, and left-recursive helpers used in one place
+		  only, like the ``@(expression "==" arith)`` groups of a chain of
+		  binary operators: Inlining them turns the indirect left-recursion
+		  into a direct one, which grows with fewer memo lookups. Emitted
+		  and operator nonterminals, and those with rule emits, are kept.
+		- Consecutive rules starting with the same items are left-factored
+		  into one rule that continues with a new nonterminal for the
+		  remaining items. As memoized results are cheap to take again, this
+		  is only done when the common prefix contains a nonterminal that
+		  isn't memoized.
+
+		Unit chains of emitted nonterminals, like ``term: mul | div |
+		factor`` with emitted ``mul`` and ``div``, are left alone, as their
+		nodes are part of the AST. Alternative literals aren't merged into
+		one regular expression, as all literals at an offset are probed at
+		once anyway.
+
+		Parse errors are reported at the furthest offset a nonterminal was
+		applied to. So that they are reported at the same offsets as before,
+		an item of kind :attr:`MARK` is left where an inlined nonterminal
+		was applied, unless a nonterminal follows at the same offset, and
+		the nonterminals of factored rules are only applied to record their
+		offset when the first of the rules continues with a nonterminal;
+		otherwise, they are added to :attr:`silent`.
+
+		Afterwards, the grammar is analyzed again.
+
+		:param memos: Dict of nonterminal names and memoization overrides,
+			as in :attr:`pynetree.Parser.memos`.
+		"""
+		NONTERM = self.NONTERM
+		MARK = self.MARK
+		keep = set([self.goal] + [self.ids[name]
+									for name, memo in (memos or {}).items() if memo])
+		memoize = [self.memoize[nterm] or nterm in keep
+						for nterm in range(len(self.names))]
+
+		def plain(rules):
+			return not any([emitrule for items, emitrule, emit in rules])
+
+		# Left-recursive nonterminals are only inlined when they are used
+		# once, which must be from within their own cycle.
+		refs = [0] * len(self.names)
+		for rules in self.rules:
+			for items, emitted, emit in rules or ():
+				for kind, sym, emitted in items:
+					refs[sym] += 1
+
+		inlinable = [rules is not None
+						and (not memoize[nterm]
+							or self.leftrec[nterm] and refs[nterm] == 1 and nterm not in keep)
+						and not self.emitted[nterm]
+						and not self.operators[nterm]
+						and plain(rules)
+							for nterm, rules in enumerate(self.rules)]
+
+		def splice(items, active):
+			res = []
+
+			for item in items:
+				if (item[0] == NONTERM and inlinable[item[1]]
+					and len(self.rules[item[1]]) == 1
+					and item[1] not in active):
+					if self.mark is None:
+						self.mark = self.symbol(" mark", MARK)
+
+					res.append((MARK, self.mark, False))
+					res.extend(splice(self.rules[item[1]][0][0],
+										active | set([item[1]])))
+				else:
+					res.append(item)
+
+			# A mark is dropped when a nonterminal is applied at its offset
+			return tuple([item for count, item in enumerate(res)
+							if item[0] != MARK or count + 1 == len(res)
+								or res[count + 1][0] not in [NONTERM, MARK]])
+
+		def alternatives(items, active):
+			items = splice(items, active)
+
+			if (len(items) == 1 and items[0][0] == NONTERM
+				and inlinable[items[0][1]] and items[0][1] not in active):
+				active = active | set([items[0][1]])
+				res = []
+
+				for items, emitted, emit in self.rules[items[0][1]]:
+					res.extend(alternatives(items, active))
+
+				return res
+
+			return [(items, False, None)]
+
+		def factor(nterm):
+			rules = self.rules[nterm]
+			res = []
+			i = 0
+
+			while i < len(rules):
+				group = [rules[i][0]]
+
+				for items, emitted, emit in rules[i + 1:]:
+					if not group[0] or items[:1] != group[0][:1]:
+						break
+
+					group.append(items)
+
+				i += len(group)
+
+				# Length of the common prefix, which must consume input and
+				# be expensive to parse again.
+				length = min([len(items) for items in group])
+				for count in range(length):
+					if any([items[count] != group[0][count] for items in group]):
+						length = count
+						break
+
+				prefix = group[0][:length]
+
+				# Whether the rules continue with a nonterminal, which is
+				# applied at the offset of the new one
+				nested = [len(items) > length and items[length][0] in [NONTERM, MARK]
+							for items in group]
+
+				if (len(group) < 2
+					or all([self.nullable[sym] for kind, sym, emitted in prefix])
+					or all([kind != NONTERM or memoize[sym]
+							for kind, sym, emitted in prefix])
+					or any(nested) and not nested[0]):
+					res.extend([(items, False, None) for items in group])
+					continue
+
+				name = self.names[nterm] + "'"
+				while name in self.ids.keys():
+					name += "'"
+
+				tail = self.symbol(name, NONTERM)
+				self.rules[tail] = [(items[length:], False, None) for items in group]
+
+				if not nested[0]:
+					self.silent.add(tail)
+
+				res.append((prefix + ((NONTERM, tail, False), ), False, None))
+				todo.append(tail)
+
+			self.rules[nterm] = res
+
+		todo = []
+
+		for nterm, rules in enumerate(self.rules):
+			if rules is None:
+				continue
+
+			if self.operators[nterm] or not plain(rules):
+				self.rules[nterm] = [(splice(items, set([nterm])), emitted, emit)
+										for items, emitted, emit in rules]
+				continue
+
+			res = []
+			for items, emitted, emit in rules:
+				res.extend(alternatives(items, set([nterm])))
+
+			self.rules[nterm] = res
+			todo.append(nterm)
+
+		while todo:
+			nterm = todo.pop()
+			factor(nterm)
+
+		self.analyze()
+
+	def binaries(self, nterm):
+		"""
+		Finds the binary operator rules of ``nterm``, which have the form
+		``nterm op nterm``, either directly or by a nonterminal with only this
+		rule, where ``op`` is a terminal with a declared precedence.
+
+		Returns a list of ``(op, kind, precedence, associativity, rule,
+		helper)`` tuples, or None if there are no such rules.
+		"""
+		def binary(items):
+			if (len(items) == 3
+				and items[0][1] == nterm and items[2][1] == nterm
+				and items[1][0] != self.NONTERM
+				and self.precedence[items[1][1]]):
+				return items[1]
+
+			return None
+
+		ops = []
+
+		for count, (items, emitted, emit) in enumerate(self.rules[nterm]):
+			helper = None
+			op = binary(items)
+
+			if (not op and len(items) == 1 and items[0][0] == self.NONTERM
+				and items[0][1] != nterm and len(self.rules[items[0][1]]) == 1):
+				helper = items[0][1]
+				op = binary(self.rules[helper][0][0])
+
+			if op:
+				prec, assoc = self.precedence[op[1]]
+				ops.append((op[1], op[0], prec, assoc, count, helper))
+
+		if not ops or len(ops) == len(self.rules[nterm]):
+			return None
+
+		return ops
+
+	def cycles(self):
+		"""
+		Finds the left-recursive nonterminals of the grammar.
+
+		A nonterminal is left-recursive when it can call itself without
+		consuming any input, either directly or over other nonterminals.
+		Returns a list that holds, per symbol ID, the set of nonterminals of
+		its left-recursive cycle, or None.
+		"""
+		# Nonterminals called at the same offset a rule starts
+		calls = [set() for sid in self.names]
+
+		for nterm, rules in enumerate(self.rules):
+			binaries = set([op[4] for op in self.operators[nterm] or ()])
+
+			for count, (items, emitted, emit) in enumerate(rules or ()):
+				if count in binaries:
+					continue
+
+				for kind, sym, emitted in items:
+					if kind == self.NONTERM:
+						calls[nterm].add(sym)
+
+					if not self.nullable[sym]:
+						break
+
+		# Tarjan's algorithm for strongly connected components, iterative
+		index = {}
+		low = {}
+		stack = []
+		onstack = set()
+		cycles = [None] * len(self.names)
+
+		for root, rules in enumerate(self.rules):
+			if rules is None or root in index:
+				continue
+
+			work = [(root, iter(calls[root]))]
+			index[root] = low[root] = len(index)
+			stack.append(root)
+			onstack.add(root)
+
+			while work:
+				nterm, it = work[-1]
+
+				for sym in it:
+					if sym not in index:
+						index[sym] = low[sym] = len(index)
+						stack.append(sym)
+						onstack.add(sym)
+						work.append((sym, iter(calls[sym])))
+						break
+					elif sym in onstack:
+						low[nterm] = min(low[nterm], index[sym])
+				else:
+					work.pop()
+					if work:
+						low[work[-1][0]] = min(low[work[-1][0]], low[nterm])
+
+					if low[nterm] == index[nterm]:
+						scc = set()
+						while True:
+							sym = stack.pop()
+							onstack.discard(sym)
+							scc.add(sym)
+
+							if sym == nterm:
+								break
+
+						if len(scc) > 1 or nterm in calls[nterm]:
+							for sym in scc:
+								cycles[sym] = scc
+
+		return cycles
+
+	def viable(self, nterm, key, tokens = False):
+		"""
+		Returns the tuple of rule indexes of ``nterm`` that may match at an
+		input position where ``key`` is the next character, or the next
+		token kind when ``tokens`` is True. ``key`` is None resp. -1 at the
+		end of input. The result is cached in the dispatch tables.
+		"""
+		res = []
+
+		for count, (nullable, first) in enumerate(self.rulefirst[nterm]):
+			if nullable:
+				res.append(count)
+			elif tokens:
+				if key in first:
+					res.append(count)
+			elif key is not None:
+				for sym in first:
+					if self.starts(sym, key):
+						res.append(count)
+						break
+
+		res = tuple(res)
+
+		if tokens:
+			self.tdispatch[nterm][key] = res
+		else:
+			self.dispatch[nterm][key] = res
+
+		return res
+
+	def __getstate__(self):
+		# The starters cached by starts() may be bound methods, which can't
+		# be pickled everywhere; they are found again on demand.
+		state = dict(self.__dict__)
+		state["starters"] = [None] * len(self.names)
+		return state
+
+	def starts(self, sym, ch):
+		"""
+		Checks if terminal ``sym`` may start with character ``ch``.
+
+		This is conservative: Callables and regex constructs that can't be
+		analyzed are assumed to start with any character.
+		"""
+		starter = self.starters[sym]
+
+		if starter is None:
+			token = self.tokens[sym]
+
+			if self.kinds[sym] == self.STRING:
+				starter = token[:1].__eq__
+			elif self.kinds[sym] == self.REGEX and isinstance(token.pattern, str):
+				starter = self.firstchars(token)
+			else:
+				starter = True
+
+			self.starters[sym] = starter
+
+		if starter is True:
+			return True
+
+		return bool(starter(ch))
+
+	def firstchars(self, regex):
+		"""
+		Returns a function matching all characters a non-empty match of
+		``regex`` can start with, or True if this can't be determined.
+		"""
+		classes = self.firstclasses(regex)
+		if classes is None:
+			return True
+
+		if not classes:
+			return lambda ch: False
+
+		try:
+			return re.compile("|".join(classes),
+								regex.flags & (re.IGNORECASE | getattr(re, "ASCII", re.UNICODE))).match
+
+		except re.error:
+			return True
+
+	def firstclasses(self, regex):
+		"""
+		Returns the list of character classes, as patterns, a non-empty
+		match of ``regex`` can start with, or None if this can't be
+		determined.
+		"""
+		def category(cat):
+			return {"CATEGORY_DIGIT": "\\d", "CATEGORY_NOT_DIGIT": "\\D",
+					"CATEGORY_SPACE": "\\s", "CATEGORY_NOT_SPACE": "\\S",
+					"CATEGORY_WORD": "\\w", "CATEGORY_NOT_WORD": "\\W"}.get(str(cat).upper())
+
+		def literal(cp):
+			try:
+				return re.escape(unichr(cp))	# Python 2's re has no \U escapes
+			except NameError:
+				return "\\U%08x" % cp
+
+		def first(items):
+			"""
+			Returns the list of character classes starting ``items`` and
+			whether ``items`` may match the empty string, or None for any
+			character.
+			"""
+			classes = []
+
+			for op, av in items:
+				op = str(op).upper()
+
+				if op == "LITERAL":
+					classes.append(literal(av))
+				elif op == "NOT_LITERAL":
+					classes.append("[^%s]" % literal(av))
+				elif op == "IN":
+					ccl = []
+					for cop, cav in av:
+						cop = str(cop).upper()
+
+						if cop == "NEGATE":
+							ccl.insert(0, "^")
+						elif cop == "LITERAL":
+							ccl.append(literal(cav))
+						elif cop == "RANGE":
+							ccl.append("%s-%s" % (literal(cav[0]), literal(cav[1])))
+						elif cop == "CATEGORY" and category(cav):
+							ccl.append(category(cav))
+						else:
+							return None
+
+					classes.append("[%s]" % "".join(ccl))
+				elif op in ["AT", "ASSERT", "ASSERT_NOT"]:
+					continue # zero-width
+				elif op == "BRANCH":
+					nullable = False
+					for alt in av[1]:
+						res = first(alt)
+						if res is None:
+							return None
+
+						classes += res[0]
+						nullable = nullable or res[1]
+
+					if not nullable:
+						return (classes, False)
+				elif op == "SUBPATTERN":
+					if av[1] or av[2]: # inline flags
+						return None
+
+					res = first(av[-1])
+					if res is None:
+						return None
+
+					classes += res[0]
+					if not res[1]:
+						return (classes, False)
+				elif op == "ATOMIC_GROUP":
+					res = first(av)
+					if res is None:
+						return None
+
+					classes += res[0]
+					if not res[1]:
+						return (classes, False)
+				elif op in ["MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"]:
+					res = first(av[2])
+					if res is None:
+						return None
+
+					classes += res[0]
+					if av[0] > 0 and not res[1]:
+						return (classes, False)
+				else:
+					return None
+
+				if op in ["LITERAL", "NOT_LITERAL", "IN"]:
+					return (classes, False)
+
+			return (classes, True)
+
+		try:
+			res = first(sre_parse.parse(regex.pattern, regex.flags))
+
+		except (re.error, TypeError, IndexError, ValueError):
+			return None
+
+		return res and res[0]
+
+	def fuse(self, sids):
+		"""
+		Fuses the regex and string tokens ``sids`` into one compiled pattern,
+		which matches any sequence of them in the given order of preference.
+
+		Returns None when the tokens can't be fused, which is the case for
+		callables, different regex flags and patterns that may match the
+		empty string.
+		"""
+		if not sids:
+			return None
+
+		patterns = []
+		strings = []
+		flags = None
+
+		for sid in sids:
+			token = self.tokens[sid]
+
+			if self.kinds[sid] == self.STRING:
+				patterns.append(re.escape(token))
+				strings.append(token)
+				continue
+
+			if self.kinds[sid] != self.REGEX or not isinstance(token.pattern, str):
+				return None
+
+			if flags is None:
+				flags = token.flags
+			elif flags != token.flags:
+				return None
+
+			try:
+				if sre_parse.parse(token.pattern, token.flags).getwidth()[0] == 0:
+					return None
+			except re.error:
+				return None
+
+			patterns.append(token.pattern)
+
+		# Static strings must not become case-insensitive
+		if (flags or 0) & re.IGNORECASE and any([x.lower() != x.upper() for x in strings]):
+			return None
+
+		try:
+			return re.compile("(?:%s)*" % "|".join(["(?:%s)" % p for p in patterns]),
+								flags or 0)
+		except re.error:
+			return None
+
+	def tokenize(self, s):
+		"""
+		Splits ``s`` into a :class:`pynetree.TokenStream` in one pass.
+
+		All tokens and literal terminals are compiled into one master
+		pattern with a named group per symbol, in this order of preference:
+		Ignored tokens, literal strings (longest first), and regex tokens in
+		their order of definition. Literal strings that are fully matched by
+		a regex token are not part of the pattern, but re-classify matches of
+		that regex token, as it is done with keywords and identifiers.
+
+		Tokens are classified without parse context: When two regex tokens
+		match the same text, it always becomes the one preferred by the
+		master pattern, whereas the parser in character mode takes the one
+		the grammar tries first at that position. The AST may then differ
+		between both modes. Such overlapping tokens are reported by
+		:meth:`overlaps`, and warned about when the master pattern is built.
+		"""
+		if self.lexer is None:
+			import warnings
+
+			self.lexer = self.master()
+
+			for sid, other, sample in self.overlaps():
+				warnings.warn("Tokens '%s' and '%s' both match '%s'; the lexer "
+								"always takes '%s', which may change the AST"
+								% (self.names[sid], self.names[other], sample,
+									self.names[sid]), stacklevel=3)
+
+		lexer, groups, keywords = self.lexer
+		stream = TokenStream(s)
+		append = stream.append
+		REGEX = self.REGEX
+		kinds = self.kinds
+
+		pos = 0
+		while pos < len(s):
+			res = lexer(s, pos)
+			if not res or res.end() == pos:
+				raise ParseError(s, pos)
+
+			sid = groups[res.lastgroup]
+			if sid >= 0:
+				if keywords and kinds[sid] == REGEX:
+					sid = keywords.get(res.group(), sid)
+
+				append(sid, pos, res.end())
+
+			pos = res.end()
+
+		return stream
+
+	def master(self):
+		"""
+		Constructs the master pattern used by :meth:`tokenize`.
+		"""
+		patterns = []
+		groups = {}
+		keywords = {}
+		regexes = []
+		strings = []
+
+		for sid, kind in enumerate(self.kinds):
+			if kind == self.CALLABLE:
+				raise CallableTokenError(self.names[sid], "a lexer")
+			elif kind == self.REGEX:
+				if sid not in self.ignores:
+					regexes.append(sid)
+			elif kind == self.STRING:
+				if sid not in self.ignores:
+					strings.append(sid)
+
+		def add(sid, pattern, flags = None):
+			name = "t%d" % sid
+			groups[name] = -1 if sid in self.ignores else sid
+
+			# Scope differing regex flags to the group
+			if flags:
+				flags = "".join([c for f, c in ((re.IGNORECASE, "i"),
+													(re.MULTILINE, "m"),
+													(re.DOTALL, "s"),
+													(re.VERBOSE, "x"))
+									if flags & f])
+				if flags:
+					pattern = "(?%s:%s)" % (flags, pattern)
+
+			patterns.append("(?P<%s>%s)" % (name, pattern))
+
+		for sid in self.ignores:
+			if self.kinds[sid] == self.STRING:
+				add(sid, re.escape(self.tokens[sid]))
+			else:
+				add(sid, self.tokens[sid].pattern, self.tokens[sid].flags)
+
+		for sid in sorted(strings, key=lambda sid: -len(self.tokens[sid])):
+			for rid in regexes:
+				res = self.tokens[rid].match(self.tokens[sid])
+				if res and res.end() == len(self.tokens[sid]):
+					keywords[self.tokens[sid]] = sid
+					break
+			else:
+				add(sid, re.escape(self.tokens[sid]))
+
+		for sid in regexes:
+			add(sid, self.tokens[sid].pattern, self.tokens[sid].flags)
+
+		return (re.compile("|".join(patterns)).match, groups, keywords)
+
+	def overlaps(self):
+		"""
+		Finds regex tokens that match the same text, so that the lexer of
+		:meth:`tokenize` may classify text differently than the parser.
+
+		A short sample text is derived from every regex token, and checked
+		against the other regex tokens. Returns a list of ``(sid, other,
+		sample)`` tuples, where ``sid`` is preferred by the lexer and both
+		fully match ``sample``. Overlaps not shown by these samples are not
+		found.
+		"""
+		try:
+			char = unichr
+		except NameError:
+			char = chr
+
+		def category(cat):
+			return {"CATEGORY_DIGIT": "0", "CATEGORY_NOT_DIGIT": "a",
+					"CATEGORY_SPACE": " ", "CATEGORY_NOT_SPACE": "a",
+					"CATEGORY_WORD": "a", "CATEGORY_NOT_WORD": " "}.get(str(cat).upper())
+
+		def sample(items):
+			"""
+			Returns a short text matched by ``items``, or None.
+			"""
+			res = ""
+
+			for op, av in items:
+				op = str(op).upper()
+
+				if op == "LITERAL":
+					res += char(av)
+				elif op in ["NOT_LITERAL", "ANY"]:
+					res += "a" if av != ord("a") else "b"
+				elif op == "IN":
+					cop, cav = av[0]
+					cop = str(cop).upper()
+
+					# Negated classes are checked by matching the sample
+					if cop == "NEGATE":
+						res += "a"
+					elif cop == "LITERAL":
+						res += char(cav)
+					elif cop == "RANGE":
+						res += char(cav[0])
+					elif cop == "CATEGORY" and category(cav):
+						res += category(cav)
+					else:
+						return None
+				elif op in ["AT", "ASSERT", "ASSERT_NOT"]:
+					continue # zero-width
+				elif op == "BRANCH":
+					alt = sample(av[1][0])
+					if alt is None:
+						return None
+
+					res += alt
+				elif op in ["SUBPATTERN", "ATOMIC_GROUP"]:
+					sub = sample(av[-1] if op == "SUBPATTERN" else av)
+					if sub is None:
+						return None
+
+					res += sub
+				elif op in ["MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"]:
+					sub = sample(av[2])
+					if sub is None:
+						return None
+
+					res += sub * max(av[0], 1)
+				else:
+					return None
+
+			return res
+
+		samples = []
+
+		for sid, kind in enumerate(self.kinds):
+			if kind != self.REGEX or sid in self.ignores:
+				continue
+
+			try:
+				text = sample(sre_parse.parse(self.tokens[sid].pattern,
+												self.tokens[sid].flags))
+			except (re.error, TypeError, IndexError, ValueError):
+				text = None
+
+			if text:
+				res = self.tokens[sid].match(text)
+				if not res or res.end() != len(text):
+					text = None
+
+			samples.append((sid, text))
+
+		res = []
+
+		for i, (sid, text) in enumerate(samples):
+			for other, othertext in samples[i + 1:]:
+				for probe in (text, othertext):
+					if not probe:
+						continue
+
+					a = self.tokens[sid].match(probe)
+					b = self.tokens[other].match(probe)
+
+					if a and b and a.end() == b.end() == len(probe):
+						res.append((sid, other, probe))
+						break
+
+		return res
+
+	def generate(self):
+		"""
+		Returns the source code of a Python module that parses this grammar
+		by one function per nonterminal, as described in
+		:meth:`pynetree.Parser.generate`.
+		"""
+		NONTERM = self.NONTERM
+		STRING = self.STRING
+		MARK = self.MARK
+
+		for sid, kind in enumerate(self.kinds):
+			if kind == self.CALLABLE:
+				raise CallableTokenError(self.names[sid], "generated parsers")
+			elif callable(self.emits[sid]):
+				raise CallableTokenError(self.names[sid], "generated parsers", "emit")
+
+			for items, emitrule, emit in self.rules[sid] or ():
+				if callable(emit):
+					raise CallableTokenError(self.names[sid], "generated parsers", "emit")
+
+		consts = []		# definitions of module-level constants
+		constnames = {}	# expression -> constant name
+		lines = []		# body of parse()
+
+		def out(level, line = ""):
+			lines.append("\t" * level + line if line else "")
+
+		def const(prefix, expr, comment):
+			"""
+			Returns the name of a module-level constant defined by ``expr``.
+			"""
+			name = constnames.get(expr)
+			if name is None:
+				name = constnames[expr] = "%s%d" % (prefix, len(consts))
+				consts.append("%s = %s\t# %s" % (name, expr, comment))
+
+			return name
+
+		def function(nterm, prefix = "n"):
+			return "%s%d_%s" % (prefix, nterm, re.sub(r"\W", "_", self.names[nterm]))
+
+		def matcher(sid):
+			token = self.tokens[sid]
+			return const("T", "re.compile(%r, %d).match" % (token.pattern, token.flags),
+							self.names[sid])
+
+		def empty(sid):
+			token = self.tokens[sid]
+
+			try:
+				return sre_parse.parse(token.pattern, token.flags).getwidth()[0] == 0
+			except (re.error, TypeError):
+				return True
+
+		def node(sid, children, start, end):
+			return "Node(%r, %r, None, None, %s, s, %s, %s)" % (
+						self.names[sid], self.emits[sid], children, start, end)
+
+		def skip(pos):
+			if not self.ignores:
+				return pos
+
+			return "skipped.get(%s) or skip(%s)" % (pos, pos)
+
+		def describe(nterm, count):
+			items, emitrule, emit = self.rules[nterm][count]
+			res = []
+
+			for kind, sym, emitted in items:
+				if kind == MARK:
+					continue
+
+				res.append(("@" if emitted else "")
+							+ (repr(self.tokens[sym]) if kind == STRING else self.names[sym]))
+
+			res = "%s: %s" % (self.names[nterm], " ".join(res))
+
+			if emitrule:
+				res += " (emits %r)" % emit
+
+			return res
+
+		def guard(nterm, count):
+			"""
+			Returns the condition on the next character ``ch`` under which
+			rule ``count`` of ``nterm`` is viable, like :meth:`viable`, or
+			None if the rule is always tried. Rules starting with a terminal
+			get no condition, as the terminal makes the same check.
+			"""
+			items = [item for item in self.rules[nterm][count][0] if item[0] != MARK]
+			nullable, first = self.rulefirst[nterm][count]
+
+			if nullable or items[0][0] != NONTERM:
+				return None
+
+			chars = set()
+			classes = {}
+
+			for sym in sorted(first):
+				token = self.tokens[sym]
+
+				if self.kinds[sym] == STRING:
+					if token:
+						chars.add(token[0])
+
+					continue
+
+				if not isinstance(token.pattern, str):
+					return "ch"
+
+				res = self.firstclasses(token)
+				if res is None:
+					return "ch"
+
+				patterns = classes.setdefault(token.flags & (re.IGNORECASE | getattr(re, "ASCII", re.UNICODE)), [])
+				for pattern in res:
+					if pattern not in patterns:
+						patterns.append(pattern)
+
+			res = []
+
+			if len(chars) == 1:
+				res.append("ch == %r" % list(chars)[0])
+			elif chars:
+				res.append("ch in %s" % const("F", "frozenset(%r)" % "".join(sorted(chars)),
+												describe(nterm, count)))
+
+			for flags, patterns in sorted(classes.items()):
+				if not patterns:
+					continue
+
+				try:
+					re.compile("|".join(patterns), flags)
+				except re.error:
+					return "ch"
+
+				res.append("%s(ch)" % const("F", "re.compile(%r, %d).match"
+													% ("|".join(patterns), flags),
+												describe(nterm, count)))
+
+			return " or ".join(res) or "False"
+
+		def call(level, sym):
+			"""
+			Applies nonterminal ``sym`` at ``pos``, giving ``res`` and ``end``.
+			"""
+			if sym not in self.silent:
+				out(level, "if pos > far[0]:")
+				out(level + 1, "far[0] = pos")
+
+			if not self.memoize[sym]:
+				out(level, "res, end = %s(pos)" % function(sym))
+			elif not self.leftrec[sym]:
+				out(level, "res = m%d.get(pos)" % sym)
+				out(level, "if res is None:")
+				out(level + 1, "res = m%d[pos] = %s(pos)" % (sym, function(sym)))
+				out(level, "res, end = res")
+			else:
+				out(level, "res, end = grow(m%d, %d, %s, pos)" % (sym, sym, function(sym)))
+
+		def consume(level, nterm, counts):
+			"""
+			Tries the rules ``counts`` of ``nterm`` at ``start``, returning
+			from the function on the first one that matches.
+			"""
+			guards = [guard(nterm, count) for count in counts]
+
+			if any(guards):
+				out(level, "ch = s[start:start + 1]")
+
+			for count, cond in zip(counts, guards):
+				items, emitrule, emit = self.rules[nterm][count]
+				indent = level
+
+				out(indent)
+				out(indent, "# %s" % describe(nterm, count))
+
+				if cond:
+					out(indent, "if %s:" % cond)
+					indent += 1
+
+				out(indent, "while True:")
+				indent += 1
+
+				out(indent, "seq = []")
+				out(indent, "pos = start")
+
+				skipped = True
+
+				for kind, sym, emitted in items:
+					if not skipped and self.ignores:
+						out(indent, "pos = %s" % skip("pos"))
+
+					if kind == NONTERM:
+						call(indent, sym)
+						out(indent, "if res is None:")
+						out(indent + 1, "break")
+
+						if emitted:
+							out(indent, "seq.append(%s)" % node(sym, "flatten(res)", "pos", "end"))
+						else:
+							out(indent, "if res:")
+							out(indent + 1, "seq.append(res)")
+
+						out(indent, "pos = end")
+						skipped = True
+
+					elif kind == MARK:
+						out(indent, "if pos > far[0]:")
+						out(indent + 1, "far[0] = pos")
+
+					elif kind == STRING:
+						token = self.tokens[sym]
+
+						# Empty literals never match
+						if not token:
+							out(indent, "break")
+							break
+
+						out(indent, "if not s.startswith(%r, pos):" % token)
+						out(indent + 1, "break")
+
+						if emitted:
+							out(indent, "seq.append(%s)"
+										% node(sym, "None", "pos", "pos + %d" % len(token)))
+
+						out(indent, "pos += %d" % len(token))
+						skipped = False
+
+					else:
+						out(indent, "end = %s(s, pos)" % matcher(sym))
+						out(indent, "if not end:")
+						out(indent + 1, "break")
+						out(indent, "end = end.end()")
+
+						# Empty matches are no matches
+						if empty(sym):
+							out(indent, "if end == pos:")
+							out(indent + 1, "break")
+
+						if emitted:
+							out(indent, "seq.append(%s)" % node(sym, "None", "pos", "end"))
+
+						out(indent, "pos = end")
+						skipped = False
+
+				else:
+					if not skipped and self.ignores:
+						out(indent, "pos = %s" % skip("pos"))
+
+					if emitrule:
+						out(indent, "seq = [Node(%r, %r, None, %d, flatten(seq))]"
+										% (self.names[nterm], emit, count))
+
+					out(indent, "return (seq, pos)")
+
+		def climb(level, nterm):
+			"""
+			Combines the operand in ``seq`` by the operators of ``nterm``
+			with a precedence level of at least ``minprec``, as the parser
+			does by precedence climbing.
+			"""
+			operators = self.operators[nterm]
+
+			out(level, "forbid = None")
+			out(level)
+			out(level, "while True:")
+			level += 1
+
+			# Take the longest operator allowed here
+			out(level, "op = -1")
+			out(level, "oplen = 0")
+
+			for count, (sym, kind, prec, assoc, rule, helper) in enumerate(operators):
+				token = self.tokens[sym]
+
+				if kind == STRING:
+					if token:
+						out(level, "if (minprec <= %d and forbid != %d and oplen < %d"
+									% (prec, prec, len(token)))
+						out(level + 1, "and s.startswith(%r, pos)):" % token)
+						out(level + 1, "op = %d" % count)
+						out(level + 1, "oplen = %d" % len(token))
+
+					continue
+
+				out(level, "if minprec <= %d and forbid != %d:" % (prec, prec))
+				out(level + 1, "end = %s(s, pos)" % matcher(sym))
+				out(level + 1, "if end and end.end() - pos > oplen:")
+				out(level + 2, "op = %d" % count)
+				out(level + 2, "oplen = end.end() - pos")
+
+			out(level, "if op < 0:")
+			out(level + 1, "return (seq, pos)")
+
+			for count, op in enumerate(operators):
+				sym, kind, prec, assoc, rule, helper = op
+
+				out(level, "%sif op == %d:" % ("el" if count else "", count))
+				indent = level + 1
+
+				# Climb for the right-hand side
+				out(indent, "rhs, end = %s(pos + oplen, %d)"
+								% (function(nterm), prec if assoc == "right" else prec + 1))
+				out(indent, "if rhs is None:")
+				out(indent + 1, "return (seq, pos)")
+
+				# Combine the operands as the equivalent left-recursive rule
+				if helper is None:
+					items, emitrule, emit = self.rules[nterm][rule]
+				else:
+					items, emitrule, emit = self.rules[helper][0]
+
+				out(indent, "res = []")
+
+				if items[0][2]:
+					out(indent, "res.append(%s)" % node(nterm, "flatten(seq)", "start", "pos"))
+				else:
+					out(indent, "if seq:")
+					out(indent + 1, "res.append(seq)")
+
+				if items[1][2]:
+					out(indent, "res.append(%s)" % node(sym, "None", "pos", "pos + oplen"))
+
+				if items[2][2]:
+					out(indent, "res.append(%s)"
+								% node(nterm, "flatten(rhs)", skip("pos + oplen"), "end"))
+				else:
+					out(indent, "if rhs:")
+					out(indent + 1, "res.append(rhs)")
+
+				if helper is not None:
+					if emitrule:
+						out(indent, "res = [Node(%r, %r, None, 0, flatten(res))]"
+										% (self.names[helper], emit))
+
+					items, emitrule, emit = self.rules[nterm][rule]
+
+					if items[0][2]:
+						out(indent, "res = [%s]" % node(helper, "flatten(res)", "start", "end"))
+
+				if emitrule:
+					out(indent, "res = [Node(%r, %r, None, %d, flatten(res))]"
+									% (self.names[nterm], emit, rule))
+
+				out(indent, "seq = res")
+				out(indent, "forbid = %r" % (prec if assoc == "nonassoc" else None))
+
+			out(level, "pos = end")
+
+		out(1, "far = [0]\t# furthest offset a nonterminal was applied to")
+
+		# Whitespace, cached per offset
+		if self.ignores:
+			out(1, "skipped = {}")
+			out(1)
+			out(1, "def skip(pos):")
+
+			if self.skip:
+				out(2, "res = skipped[pos] = %s(s, pos).end()"
+						% const("S", "re.compile(%r, %d).match"
+										% (self.skip.pattern, self.skip.flags), "ignored"))
+				out(2, "return res")
+			else:
+				out(2, "res = pos")
+				out(2)
+				out(2, "while True:")
+
+				for sym in self.ignores:
+					token = self.tokens[sym]
+
+					if self.kinds[sym] == STRING:
+						if token:
+							out(3, "if s.startswith(%r, res):" % token)
+							out(4, "res += %d" % len(token))
+							out(4, "continue")
+					else:
+						out(3, "end = %s(s, res)" % matcher(sym))
+						out(3, "if end and end.end() > res:")
+						out(4, "res = end.end()")
+						out(4, "continue")
+
+				out(3, "break")
+				out(2)
+				out(2, "skipped[pos] = res")
+				out(2, "return res")
+
+		# Memo tables
+		out(1)
+		leftrec = False
+
+		for nterm, rules in enumerate(self.rules):
+			if rules is not None and self.memoize[nterm]:
+				out(1, "m%d = {}\t# %s" % (nterm, self.names[nterm]))
+				leftrec = leftrec or bool(self.leftrec[nterm])
+
+		if leftrec:
+			lines.extend(self.LEFTREC.split("\n"))
+
+		for nterm, prods in enumerate(self.rules):
+			if prods is None:
+				continue
+
+			out(1)
+
+			if self.operators[nterm]:
+				binaries = set([op[4] for op in self.operators[nterm]])
+
+				out(1, "def %s(start):" % function(nterm, "o"))
+				consume(2, nterm, [count for count in range(len(prods)) if count not in binaries])
+				out(2)
+				out(2, "return (None, start)")
+				out(1)
+
+				out(1, "def %s(off, minprec = 0):" % function(nterm))
+				out(2, "start = %s" % skip("off"))
+				out(2, "seq, pos = %s(start)" % function(nterm, "o"))
+				out(2, "if seq is None:")
+				out(3, "return (None, off)")
+				out(2)
+
+				climb(2, nterm)
+
+			elif self.ignores:
+				out(1, "def %s(off):" % function(nterm))
+				out(2, "start = %s" % skip("off"))
+				consume(2, nterm, range(len(prods)))
+				out(2)
+				out(2, "return (None, off)")
+
+			else:
+				out(1, "def %s(start):" % function(nterm))
+				consume(2, nterm, range(len(prods)))
+				out(2)
+				out(2, "return (None, start)")
+
+		out(1)
+		out(1, "pos = %s" % skip("0"))
+		call(1, self.goal)
+		out(1, "if res is None:")
+		out(2, "end = 0")
+		out(1)
+		out(1, "if res is None or end < len(s):")
+		out(2, "raise ParseError(s, max(end, far[0]))")
+		out(1)
+
+		if self.emitted[self.goal]:
+			out(1, "return Node(%r, %r, children = flatten(res))"
+					% (self.names[self.goal], self.emits[self.goal]))
+		else:
+			out(1, "return Node(children = flatten(res))")
+
+		return self.MODULE % {
+			"goal": self.names[self.goal],
+			"version": __version__,
+			"constants": "\n".join(consts),
+			"classes": self.LRCLASSES if leftrec else "",
+			"parse": "\n".join(lines)
+		}
+
+	# Templates of generate()
+	MODULE = '''#-*- coding: utf-8 -*-
+"""
+Parser for the goal symbol '%(goal)s', generated by pynetree %(version)s.
+
+parse(s) returns the abstract syntax tree of s, or raises a ParseError.
+"""
+
+import re
+from pynetree import Node, ParseError
+
+%(constants)s
+
+def flatten(seq):
+	res = []
+	stack = [iter(seq)]
+
+	while stack:
+		for item in stack[-1]:
+			if isinstance(item, list):
+				stack.append(iter(item))
+				break
+
+			res.append(item)
+		else:
+			stack.pop()
+
+	return res
+%(classes)s
+def parse(s):
+	"""
+	Parses s, and returns its abstract syntax tree.
+	"""
+%(parse)s
+'''
+
+	LRCLASSES = '''
+class Lr(object):
+	__slots__ = ("nterm", "seed", "head")
+
+	def __init__(self, nterm):
+		self.nterm = nterm
+		self.seed = None
+		self.head = None
+
+class Head(object):
+	def __init__(self, nterm):
+		self.nterm = nterm
+		self.involved = set()
+		self.evaluate = set()
+'''
+
+	LEFTREC = '''
+	heads = {}
+	lrstack = []
+
+	def lrstart(sym, lr):
+		if not lr.head:
+			lr.head = Head(sym)
+
+		for item in reversed(lrstack):
+			if item.head is lr.head:
+				break
+
+			item.head = lr.head
+			lr.head.involved.add(item.nterm)
+
+	def grow(memo, sym, consume, pos):
+		"""
+		Applies the left-recursive nonterminal sym at pos by consume(),
+		and grows its seed as long as it gets longer.
+		"""
+		entry = memo.get(pos)
+		head = heads.get(pos)
+
+		if head:
+			if entry is None and sym != head.nterm and sym not in head.involved:
+				return (None, pos)
+
+			if sym in head.evaluate:
+				head.evaluate.discard(sym)
+
+				res, end = consume(pos)
+				entry[0] = res
+				entry[1] = end
+				return (res, end)
+
+		if entry is None:
+			lr = Lr(sym)
+			lrstack.append(lr)
+			entry = memo[pos] = [lr, pos]
+
+			res, end = consume(pos)
+			lrstack.pop()
+			entry[1] = end
+
+			if not lr.head:
+				entry[0] = res
+				return (res, end)
+
+			lr.seed = res
+
+			if lr.head.nterm != sym:
+				return (res, end)
+
+			entry[0] = res
+			if res is None:
+				return (None, end)
+
+			head = heads[pos] = lr.head
+			head.evaluate = set(head.involved)
+
+			while True:
+				res, end = consume(pos)
+				if res is None or end <= entry[1]:
+					del heads[pos]
+					return (entry[0], entry[1])
+
+				entry[0] = res
+				entry[1] = end
+				head.evaluate = set(head.involved)
+
+		if isinstance(entry[0], Lr):
+			lrstart(sym, entry[0])
+			return (entry[0].seed, entry[1])
+
+		return (entry[0], entry[1])'''
+
+	def symbol(self, name, kind, token = None):
+		"""
+		Registers symbol ``name`` of ``kind`` and returns its ID.
+		"""
+		sid = self.ids[name] = len(self.names)
+
+		self.names.append(name)
+		self.kinds.append(kind)
+		self.tokens.append(token)
+		self.emitted.append(False)
+		self.emits.append(None)
+		self.actions.append(None)
+		self.rules.append(None)
+		self.precedence.append(None)
+
+		return sid
+
+class Memo(object):
+	"""
+	Interface of the packrat memo tables used by :meth:`pynetree.Parser.parse`.
+
+	A memo table stores parse results by nonterminal ID and input offset
+	(or token index). Every table counts the entries it holds in ``size``,
+	and the largest number of entries held at once in ``peak``.
+	"""
+
+	#: When set, the parser calls :meth:`evict` every ``window`` offsets.
+	window = None
+
+	def reset(self, nterms, length):
+		"""
+		Prepares the table for a parse of ``length`` offsets over a grammar
+		with ``nterms`` symbols.
+		"""
+		self.size = 0
+		self.peak = 0
+
+	def get(self, nterm, off):
+		"""
+		Returns the entry for ``nterm`` at ``off``, or None.
+		"""
+		raise NotImplementedError()
+
+	def set(self, nterm, off, entry):
+		"""
+		Stores ``entry`` for ``nterm`` at ``off``.
+		"""
+		raise NotImplementedError()
+
+	def evict(self, low, pinned):
+		"""
+		Drops entries at offsets below ``low``, except those at offsets in
+		``pinned``, which belong to evaluations still in progress. Dropped
+		entries are re-parsed when they are requested again.
+		"""
+		pass
+
+class DictMemo(Memo):
+	"""
+	Memo table as one dict keyed by ``off * nterms + nterm``, keeping all
+	entries until the parse is finished. This is the default.
+	"""
+
+	def reset(self, nterms, length):
+		super(DictMemo, self).reset(nterms, length)
+		self.nterms = nterms
+		self.table = {}
+
+	def get(self, nterm, off):
+		return self.table.get(off * self.nterms + nterm)
+
+	def set(self, nterm, off, entry):
+		self.table[off * self.nterms + nterm] = entry
+		self.size += 1
+		self.peak = self.size
+
+class ArrayMemo(Memo):
+	"""
+	Memo table as one list per nonterminal, indexed by offset.
+
+	The lists are allocated on first use, with one slot per offset. This
+	saves the key computation and hashing of :class:`DictMemo`, but only pays off
+	on short inputs, or on token streams.
+	"""
+
+	def reset(self, nterms, length):
+		super(ArrayMemo, self).reset(nterms, length)
+		self.tables = [None] * nterms
+		self.length = length + 1
+
+	def get(self, nterm, off):
+		table = self.tables[nterm]
+		if table is None:
+			return None
+
+		return table[off]
+
+	def set(self, nterm, off, entry):
+		table = self.tables[nterm]
+		if table is None:
+			table = self.tables[nterm] = [None] * self.length
+
+		table[off] = entry
+		self.size += 1
+		self.peak = self.size
+
+class WindowMemo(DictMemo):
+	"""
+	Memo table that only keeps entries of the last ``window`` offsets.
+
+	Whenever the parser advanced by another ``window`` offsets, all
+	entries behind that window are evicted, so the memory used stays bounded
+	on long inputs. Backtracking behind the window re-parses the input.
+	"""
+
+	def __init__(self, window = 4096):
+		self.window = window
+
+	def evict(self, low, pinned):
+		nterms = self.nterms
+		self.table = dict([(key, entry) for key, entry in self.table.items()
+							if key // nterms >= low or key // nterms in pinned])
+		self.size = len(self.table)
+
+	def set(self, nterm, off, entry):
+		self.table[off * self.nterms + nterm] = entry
+		self.size += 1
+
+		if self.size > self.peak:
+			self.peak = self.size
+
+# Memo entries and left-recursion state of Parser._parse()
+class _Entry(object):
+	__slots__ = ("res", "pos")
+
+	def __init__(self, res = None, pos = 0):
+		self.res = res
+		self.pos = pos
+
+class _Lr(object):
+	__slots__ = ("nterm", "off", "seed", "head")
+
+	def __init__(self, nterm, off, seed = None, head = None):
+		self.nterm = nterm
+		self.off = off
+		self.seed = seed	# The initial parse seed
+		self.head = head	# Refers to the head
+
+class _Head(object):
+	__slots__ = ("nterm", "involved", "evaluate")
+
+	def __init__(self, nterm):
+		self.nterm = nterm
+		self.involved = set()	# nterminals involved into left-recursion
+		self.evaluate = set()	# subset of involved non-terminals that may
+								# be evaluated
+
+class Parser(object):
+	"""
+	The main parser class that implements a pynetree parser.
+
+	The class provides functions for defining the grammar,
+	parsing input, dumping and traversing the resulting parse
+	tree or abstract syntax tree.
+	"""
+	AUTOTOKNAME = "T$%03d"
+
+	_handlers = {}	# (class, prefixes) -> names of traversal functions
+	_bnfparser = None	# Parser for the grammar definition language
+
+	def __init__(self, grm, dump = False, optimize = False, cache = None):
+		"""
+		Constructs a new pynetree Parser object.
+
+		:param grm: The grammar to be used; This can either be a dictionary of
+					symbols and relating productions, or a string that is
+					expressed in the BNF-styled grammar definition parser.
+		:type grm: dict | str
+
+		:param dump: Dump parsed grammar (only when grm was a string)
+
+		:param optimize: Rewrite the compiled grammar by
+			:meth:`pynetree.CompiledGrammar.optimize`, which inlines and
+			left-factors rules without changing the AST.
+		:type optimize: bool
+
+		:param cache: Directory where grammars built from the grammar
+			definition language are cached, keyed by a hash of the grammar
+			and the pynetree version. If the grammar is found there, it is
+			loaded instead of being parsed again.
+		:type cache: str
+		"""
+		self.grammar = {}
+		self.goal = None
+		self.tokens = {}
+		self.ignores = []
+		self.emits = {}
+		self.actions = {}
+		self.memos = {}
+		self.precedences = {}
+		self.optimize = optimize
+		self.stats = {}
+		self._compiled = None
+
+		def uniqueName(n):
+			"""
+			Generates a unique symbol name from ``n``, by adding
+			single-quotation characters to the end of ``n`` until
+			no symbol with such a name exists in the grammar.
+			"""
+			while n in self.tokens.keys():
+				n += "'"
+
+			while n in self.grammar.keys():
+				n += "'"
+
+			return n
+
+		def generateModifier(nonterm, sym, mod):
+			if mod in ["*", "+"]:
+				oneOrMore = uniqueName(nonterm)
+				self.grammar[oneOrMore] = [[oneOrMore, sym], [sym]]
+				sym = oneOrMore
+
+			if mod in ["?", "*"]:
+				oneOrNone = uniqueName(nonterm)
+				self.grammar[oneOrNone] = [[sym], []]
+				sym = oneOrNone
+
+			return sym
+
+
+		restored = False
+
+		if cache and not isinstance(grm, dict):
+			import sys, zlib
+
+			cache = os.path.join(cache, "pynetree-%s-py%d-%08x.grammar"
+									% (__version__, sys.version_info[0],
+										zlib.crc32(grm.encode("utf-8")) & 0xffffffff))
+
+			restored = not dump and self._restore(cache, grm)
+
+		if isinstance(grm, dict):
+			# Rewrite grammar modifiers and goal according provided grammar
+			for n, np in grm.items():
+				flags = n.split()[1:]
+				n = n.split()[0]
+
+				if n.startswith("@"):
+					n = n[1:]
+					self.emits[n] = None
+
+				if n.endswith("$"):
+					if n in self.emits.keys():
+						self.emits[n[:-1]] = self.emits[n]
+						del self.emits[n]
+
+					n = n[:-1]
+					self.goal = n
+
+				for flag in flags:
+					if flag not in ["%memo", "%nomemo"]:
+						raise SyntaxError("Unknown flag '%s' for '%s'" % (flag, n))
+
+					self.memos[n] = flag == "%memo"
+
+				if not np:
+					self.grammar[n] = [""]
+				elif not isinstance(np, list):
+					self.grammar[n] = [np]
+				else:
+					self.grammar[n] = np[:]
+
+				np = self.grammar[n] = [x.split() for x in self.grammar[n]]
+
+				rnp = []
+				for p in np:
+
+					rp = []
+					for sym in p:
+						if len(sym) > 1 and sym.startswith("@"):
+							sym = sym[1:]
+							self.emits[sym] = None
+
+						if any([len(sym) > 1 and sym.endswith(x)
+						                            for x in "*+?"]):
+							sym = generateModifier(n, sym[:-1], sym[-1:])
+
+						rp.append(sym)
+
+					rnp.append(rp)
+
+				self.grammar[n] = rnp
+		elif not restored:
+			# Construct a parser for the BNF input language, once per process.
+			bnfparser = Parser._bnfparser
+
+			if bnfparser is None:
+				bnfparser = Parser({
+					"opt_ident": ["IDENT", ""],
+					"opt_emit": ["EMIT", ""],
+
+					"inline": ["EMIT opt_ident ( alternation )", "( alternation )"],
+
+					"symbol": ["IDENT", "STRING", "TOKEN", "REGEX", "CCL", "inline"],
+
+					"mod_kleene": "symbol *",
+					"mod_positive": "symbol +",
+					"mod_optional": "symbol ?",
+					"modifier": ["mod_kleene", "mod_positive", "mod_optional", "symbol"],
+
+					"sequence": ["sequence modifier", "modifier"],
+
+					"production": ["sequence", ""],
+
+					"alternation": ["alternation | production", "production"],
+
+					"nontermflag": ["GOAL", "MEMO", "NOMEMO"], #fixme sticky
+					"nontermflags": ["nontermflags nontermflag", "nontermflag", ""],
+					"nontermdef": ["opt_emit IDENT nontermflags : alternation ;" ],
+
+					"termsym": ["STRING", "REGEX", "CCL", "IDENT"],
+					"termdef": ["opt_emit IDENT termsym ;", "IGNORE termsym ;"] ,
+
+					"opsym": ["STRING", "TOKEN", "IDENT"],
+					"opsyms": ["opsyms opsym", "opsym"],
+					"precdef": ["PREC opsyms ;"],
+
+					"definition": ["nontermdef", "termdef", "precdef"],
+					"definitions": ["definitions definition", "definition"],
+					"grammar$": "definitions"})
+
+				bnfparser.ignore(r"\s+")
+				bnfparser.ignore(r"//[^\n]*\n")
+				bnfparser.ignore(r"/\*([^*]|\*[^/])*\*/")
+
+				bnfparser.token("IDENT", r"\w+")
+				bnfparser.token("CCL", r"\[[^\]]*\]")
+				bnfparser.token("STRING", r"'[^']*'")
+				bnfparser.token("TOKEN", r'"[^"]*"')
+				bnfparser.token("REGEX", r"/(\\.|[^\\/])*/")
+
+				bnfparser.token("GOAL", "$", static=True)
+				bnfparser.token("EMIT", "@", static=True)
+				bnfparser.token("MEMO", "%memo", static=True)
+				bnfparser.token("NOMEMO", "%nomemo", static=True)
+				bnfparser.token("IGNORE", r"%(ignore|skip)")
+				bnfparser.token("PREC", r"%(left|right|nonassoc)")
+
+				bnfparser.emit(["IDENT", "STRING", "TOKEN", "REGEX", "CCL",
+								"GOAL", "EMIT", "MEMO", "NOMEMO", "IGNORE", "PREC"])
+				bnfparser.emit(["inline", "mod_kleene", "mod_positive",
+				                    "mod_optional", "production", "nontermdef",
+										"termdef", "precdef", "grammar"])
+
+				Parser._bnfparser = bnfparser
+
+			ast = bnfparser.parse(grm)
+			if not ast:
+				raise SyntaxError()
+
+			def buildSymbol(nonterm, symdef):
+				"""
+				AST traversal function for symbol level in the BNF-grammar.
+				"""
+
+				if symdef.symbol.startswith("mod_"):
+					sym = buildSymbol(nonterm, symdef.children[0])
+					sym = generateModifier(nonterm, sym,
+										   {"kleene":"*",
+											"positive":"+",
+											"optional":"?"}[symdef.symbol[4:]])
+				elif symdef.symbol == "inline":
+					sym = uniqueName(nonterm)
+					self.grammar[sym] = []
+					buildNonterminal(sym, symdef.select("production"))
+
+					if symdef.select("EMIT"):
+						ident = symdef.select("IDENT", 0)
+						if ident is not None:
+							self.emit(sym, ident.match)
+						else:
+							self.emit((nonterm, len(self.grammar[nonterm])))
+
+				elif symdef.symbol == "TOKEN":
+					sym = symdef.match[1:-1]
+					self.tokens[sym] = sym
+					self.emits[sym] = None
+				elif symdef.symbol == "REGEX":
+					sym = uniqueName(nonterm.upper())
+					self.token(sym, symdef.match[1:-1])
+					self.emits[sym] = None
+				elif symdef.symbol == "CCL":
+					sym = uniqueName(nonterm.upper())
+					self.token(sym, symdef.match)
+				elif symdef.symbol == "STRING":
+					sym = symdef.match[1:-1]
+
+				else:
+					sym = symdef.match
+
+				return sym
+
+			def buildNonterminal(nonterm, prods):
+				"""
+				AST traversal function for nonterminals in the BNF-grammar.
+				"""
+				for p in prods:
+					seq = []
+
+					for s in p.children:
+						seq.append(buildSymbol(nonterm, s))
+
+					self.grammar[nonterm].append(seq)
+
+			if dump:
+				ast.dump()
+
+			# Integrate all non-terminals into the grammar.
+			for d in ast.select("nontermdef"):
+				sym = d.select("IDENT", 0).match
+				self.grammar[sym] = []
+
+			# Now build the grammar
+			nonterm = None
+
+			for d in ast.children:
+				if d.check("termdef"):
+					term = d.select("IDENT", 0)
+					if term:
+						term = term.match
+					else:
+						term = self.AUTOTOKNAME % (len(self.tokens.keys()) + 1)
+
+					if d.contains("STRING"):
+						dfn = d.select("STRING", 0).match[1:-1]
+					elif d.contains("REGEX"):
+						dfn = re.compile(d.select("REGEX", 0).match[1:-1])
+					elif d.contains("CCL"):
+						dfn = re.compile(d.select("CCL", 0).match)
+					else:
+						dfn = d.select("IDENT", 1).match
+
+					if term in self.tokens.keys():
+						raise MultipleDefinitionError(term)
+
+					self.tokens[term] = dfn
+
+					if d.select("EMIT"):
+						self.emit(term)
+					elif d.select("IGNORE"):
+						self.ignores.append(term)
+
+				elif d.check("precdef"):
+					ops = []
+
+					for op in d.children[1:]:
+						if op.check("IDENT"):
+							ops.append(op.match)
+						else:
+							ops.append(op.match[1:-1])
+
+						if op.check("TOKEN"):
+							self.tokens[ops[-1]] = ops[-1]
+							self.emits[ops[-1]] = None
+
+					self.precedence(d.select("PREC", 0).match[1:], ops)
+
+				else: # d == "nontermdef"
+					nonterm = d.select("IDENT", 0).match
+					buildNonterminal(nonterm, d.select("production"))
+
+					if d.select("EMIT"):
+						self.emit(nonterm)
+					if d.select("GOAL"):
+						self.goal = nonterm
+					if d.select("MEMO"):
+						self.memoize(nonterm)
+					elif d.select("NOMEMO"):
+						self.memoize(nonterm, False)
+
+			# Last nonterminal becomes goal, if not set by flags
+			if not self.goal and nonterm:
+				self.goal = nonterm
+
+			if cache:
+				self._store(cache, grm)
+
+		if not self.goal:
+			raise GoalSymbolNotDefined()
+
+		#print(self.grammar)
+		#print(self.tokens)
+		#print(self.emits)
+
+
+	def _store(self, path, source):
+		"""
+		Writes the grammar, tokens, emits and flags of the parser, built
+		from the grammar definition ``source``, to the file ``path`` for
+		:meth:`_restore`. Nothing is written if the grammar contains
+		callable tokens or emits, or on I/O errors.
+		"""
+		import marshal
+
+		tokens = []
+
+		for name, token in self.tokens.items():
+			if isinstance(token, str):
+				tokens.append((name, token))
+			elif hasattr(token, "pattern"):
+				tokens.append((name, token.pattern, token.flags))
+			else:
+				return
+
+		if any([callable(emit) for emit in self.emits.values()]):
+			return
+
+		data = {
+			"source": source,
+			"grammar": self.grammar,
+			"goal": self.goal,
+			"tokens": tokens,
+			"ignores": self.ignores,
+			"emits": self.emits,
+			"memos": self.memos,
+			"precedences": self.precedences
+		}
+
+		try:
+			if not os.path.isdir(os.path.dirname(path)):
+				os.makedirs(os.path.dirname(path))
+
+			# Written under a temporary name first, so concurrent processes
+			# never read a partial file.
+			tmp = "%s.%d" % (path, os.getpid())
+
+			f = open(tmp, "wb")
+			marshal.dump(data, f)
+			f.close()
+
+			os.rename(tmp, path)
+
+		except (IOError, OSError, ValueError):
+			pass
+
+	def _restore(self, path, source):
+		"""
+		Loads the grammar stored by :meth:`_store` for the grammar
+		definition ``source`` from ``path``, and returns True on success.
+		"""
+		import marshal
+
+		try:
+			f = open(path, "rb")
+			data = marshal.load(f)
+			f.close()
+
+		except (IOError, OSError, EOFError, ValueError, TypeError):
+			return False
+
+		if not isinstance(data, dict) or data.get("source") != source:
+			return False
+
+		self.grammar = data["grammar"]
+		self.goal = data["goal"]
+
+		for token in data["tokens"]:
+			if len(token) == 3:
+				self.tokens[token[0]] = re.compile(token[1], token[2])
+			else:
+				self.tokens[token[0]] = token[1]
+
+		self.ignores = data["ignores"]
+		self.emits = data["emits"]
+		self.memos = data["memos"]
+		self.precedences = data["precedences"]
+		self._compiled = None
+
+		return True
+
+	def __getstate__(self):
+		"""
+		Returns the state to be pickled, which includes the compiled
+		grammar. Callable tokens, emits and actions must be picklable
+		themselves, like functions defined at module level; otherwise, a
+		:class:`pynetree.CallableTokenError` is raised.
+		"""
+		import pickle
+
+		for what, items in [("token", self.tokens), ("emit", self.emits),
+								("action", self.actions)]:
+			for name, value in items.items():
+				if not callable(value):
+					continue
+
+				try:
+					pickle.dumps(value, 2)
+				except (pickle.PicklingError, AttributeError, TypeError):
+					raise CallableTokenError(name, "pickled parsers", what)
+
+		return self.__dict__
+
+	def token(self, name, token = None, static = False, emit = None):
+		"""
+		Adds a new terminal token ``name`` to the parser.
+
+		:param name: The unique, identifying name of the token to be added.
+		:type name: str
+
+		:param token: The token definition that is registered with ``name``.
+			If this is a str, and ``static`` is False, it will be interpreted
+			as regular expression. If omitted, ``token`` is set to ``name`` as
+			static string.
+		:type token: str | re | callable
+
+		:param static: If True, ``token`` is direcly taken as is, and not
+			interpreted as a regex str.
+
+		:param emit: If set, the token is configured to be emitted.
+		:type emit: bool | str | callable
+		"""
+
+		if isinstance(name, list):
+			for n in name:
+				self.token(n, token=token, static=static)
+
+			return
+
+		if name in self.tokens.keys() or name in self.grammar.keys():
+			raise MultipleDefinitionError(name)
+
+		if token:
+			if not static and isinstance(token, str):
+				token = re.compile(token)
+		else:
+			token = str(name)
+
+		self.tokens[name] = token
+		self._compiled = None
+
+		if emit:
+			self.emits[name] = emit if not isinstance(emit, bool) else None
+
+	def ignore(self, token, static = False):
+		"""
+		Adds a new ignore terminal (whitespace) to the parser.
+
+		:param token: The token definition of the whitespace symbol.
+			If this is a str, and ``static`` is False, it will be interpreted
+			as regular expression.
+		:type token: str | re | callable
+
+		:param static: If True, ``token`` is direcly taken as is, and not
+			interpreted as a regex str.
+		"""
+
+		name = self.AUTOTOKNAME % len(self.tokens.keys())
+		self.token(name, token, static)
+		self.ignores.append(name)
+		self._compiled = None
+
+	def emit(self, name, emit = None):
+		"""
+		Defines which symbols of the grammar shall be emitted in the
+		generated, abstract syntax tree (AST).
+
+		:param name: The name of the symbol that shall be emitted.
+			Alternatively, a list of symbol names is accepted.
+		:type name: str | list
+
+		:param emit: An emit string that is used instead of the symbol
+						name. This can also be a callable, which is
+						called using AST traversal. If omitted, the
+						symbol's name is used as emit.
+		:type action: str | callable
+		"""
+		if isinstance(name, list):
+			for n in name:
+				self.emit(n, emit)
+
+			return
+
+		if isinstance(name, tuple):
+			testname = name[0]
+		else:
+			testname = name
+
+		if (not testname in self.grammar.keys()
+			and not testname in self.tokens.keys()):
+			raise SymbolNotFoundError(testname)
+
+		self.emits[name] = emit
+		self._compiled = None
+
+	def action(self, name, action):
+		"""
+		Defines a reduction action for an emitted symbol, which computes
+		its value when parsing with ``tree="value"``.
+
+		The action is called as soon as the symbol is accepted: For
+		terminals, with the matched string, and for nonterminals and rule
+		emits, with the values of their emitted children as arguments. It
+		returns the symbol's value. Emitted symbols without an action get
+		their match, or a tuple of their name and a list of the children's
+		values, respectively.
+
+		Actions may be called for results that are dropped later on by
+		backtracking, and should therefore not have side effects. Their
+		values are memoized along with the parse results.
+
+		:param name: The name of the symbol, a tuple of a nonterminal's
+			name and a rule index for a rule emit, or a list of these.
+		:type name: str | tuple | list
+
+		:param action: The action to be called.
+		:type action: callable
+		"""
+		if isinstance(name, list):
+			for n in name:
+				self.action(n, action)
+
+			return
+
+		if isinstance(name, tuple):
+			testname = name[0]
+		else:
+			testname = name
+
+		if (not testname in self.grammar.keys()
+			and not testname in self.tokens.keys()):
+			raise SymbolNotFoundError(testname)
+
+		self.actions[name] = action
+		self._compiled = None
+
+	def precedence(self, assoc, symbols):
+		"""
+		Declares operator terminals of one precedence level. Every call
+		declares a level binding tighter than the levels declared before.
+
+		A nonterminal with rules of the form ``expr op expr``, where ``op``
+		is a declared operator, is parsed by precedence climbing instead of
+		left-recursion. Such rules can also be wrapped into a nonterminal,
+		like ``@add: expr '+' expr;`` with ``expr: add | ...;``, to emit
+		nodes per operator. In the grammar definition language, this is
+		declared by ``%left``, ``%right`` or ``%nonassoc`` followed by the
+		operator symbols.
+
+		:param assoc: Associativity of the operators.
+		:type assoc: "left" | "right" | "nonassoc"
+
+		:param symbols: The operator terminals, as token names or literal
+			strings. A single name is accepted as well.
+		:type symbols: str | list
+		"""
+		if assoc not in ["left", "right", "nonassoc"]:
+			raise ValueError("Invalid associativity '%s'" % assoc)
+
+		if not isinstance(symbols, list):
+			symbols = [symbols]
+
+		level = len(set([prec for prec, a in self.precedences.values()])) + 1
+
+		for sym in symbols:
+			self.precedences[sym] = (level, assoc)
+
+		self._compiled = None
+
+	def memoize(self, name, memoize = True):
+		"""
+		Overrides whether results of nonterminal or token ``name`` are
+		memoized.
+
+		By default, the grammar compiler memoizes left-recursive nonterminals
+		and those referenced from several places, except for trivial ones
+		that only wrap single terminals. Left-recursive nonterminals are
+		always memoized, as the left-recursion support depends on it.
+
+		In the grammar definition language and in dict-style grammars, the
+		flags ``%memo`` and ``%nomemo`` can be put behind the nonterminal's
+		name for the same purpose.
+
+		Token matches are memoized per input offset by default. Callable
+		tokens that don't return the same result for the same offset must
+		be excluded from this.
+
+		:param name: The name of the nonterminal or token. Alternatively, a
+			list of names is accepted.
+		:type name: str | list
+
+		:param memoize: True to memoize, False to always re-evaluate.
+		:type memoize: bool
+		"""
+		if isinstance(name, list):
+			for n in name:
+				self.memoize(n, memoize)
+
+			return
+
+		if (not name in self.grammar.keys()
+			and not name in self.tokens.keys()):
+			raise SymbolNotFoundError(name)
+
+		self.memos[name] = memoize
+		self._compiled = None
+
+	def compile(self):
+		"""
+		Compiles the current grammar, tokens, ignores and emits into a
+		:class:`pynetree.CompiledGrammar`, which is used by :meth:`parse`.
+
+		This is done automatically on the first call to :meth:`parse`, and
+		again after the next call to :meth:`token`, :meth:`ignore` or
+		:meth:`emit`. It must be called explicitly only when the grammar
+		dicts were modified directly.
+
+		:returns: The compiled grammar.
+		:rtype: CompiledGrammar
+		"""
+		self._compiled = CompiledGrammar(self)
+		return self._compiled
+
+	def generate(self):
+		"""
+		Generates the source code of a standalone Python module, which
+		parses the language of the current grammar without interpreting it.
+
+		The module provides a function ``parse(s)``, which returns the same
+		abstract syntax tree of :class:`pynetree.Node` objects as
+		:meth:`parse`, or raises a :class:`pynetree.ParseError` at the same
+		offset. Every nonterminal is parsed by a function of its own, with
+		the regular expressions, literals and emits of its rules inlined,
+		and left-recursion and operator precedences are supported as well.
+		The module only imports these two classes from pynetree, so the
+		grammar isn't parsed or compiled again when it is loaded.
+
+		Generated parsers run on strings only, without lexer-first mode,
+		memo table backends or other kinds of trees. As their functions
+		call each other, the nesting depth of the input is limited by
+		Python's recursion limit. Callable tokens and emits can't be
+		generated and raise a :class:`pynetree.CallableTokenError`.
+
+		:returns: The source code of the module.
+		:rtype: str
+		"""
+		return (self._compiled or self.compile()).generate()
+
+	def tokenize(self, s, tokens = None):
+		"""
+		Turns ``s`` into a :class:`pynetree.TokenStream`, which can be
+		parsed by :meth:`parse` on token level.
+
+		By default, all tokens and literal terminals are compiled into one
+		master pattern which splits ``s`` in a single pass; callable tokens
+		are not supported here. Alternatively, ``tokens`` can provide the
+		output of an external lexer.
+
+		:param s: The input string to be tokenized.
+		:type s: str
+
+		:param tokens: Iterable of ``(symbol, start, end)`` tuples, where
+			``symbol`` is a token name or literal terminal string, and
+			``start`` and ``end`` are offsets into ``s``. Whitespace must
+			already be removed.
+
+		:returns: The token stream.
+		:rtype: TokenStream
+		"""
+		g = self._compiled or self.compile()
+
+		if tokens is None:
+			return g.tokenize(s)
+
+		stream = TokenStream(s)
+
+		for sym, start, end in tokens:
+			if sym not in g.ids.keys() or g.kinds[g.ids[sym]] == g.NONTERM:
+				raise SymbolNotFoundError(sym)
+
+			stream.append(g.ids[sym], start, end)
+
+		return stream
+
+	def parse(self, s, lexer = False, memo = None, tree = "node"):
+		"""
+		Parse ``s`` with the currently defined grammar.
+
+		This invokes the parser on a given input, and returns the
+		abstract syntax tree of this input on success.
+
+		The parser is implemented as a modified packrat parsing algorithm,
+		with support of left-recursive grammars.
+
+		:param s: The input string to be parsed, or a token stream
+			returned by :meth:`tokenize`.
+		:param s: str | TokenStream
+
+		:param lexer: If True, ``s`` is tokenized by :meth:`tokenize`
+			first, and the parser runs on token indexes instead of
+			character offsets. Tokens are classified without parse
+			context, so overlapping tokens may change the AST.
+
+		:param memo: The memo table to be used, which allows to trade
+			memory against re-parsing on long inputs. Defaults to a new
+			:class:`pynetree.DictMemo`.
+		:type memo: Memo
+
+		:param tree: The kind of tree to be returned: ``"node"`` for a tree
+			of :class:`pynetree.Node` objects, ``"flat"`` for a
+			:class:`pynetree.FlatTree`, which stores all nodes in arrays,
+			``"events"`` for a generator of events as described in
+			:meth:`parse_events`, or ``"value"`` to compute a value by the
+			actions defined with :meth:`action` instead of building a tree.
+			The value of an input whose goal symbol isn't emitted is the
+			list of the top-level values.
+		:type tree: str
+
+		:returns: Abstract syntax tree, None on error.
+		:rtype: Node | FlatTree | generator | object
+		"""
+		return self._parse(s, lexer, memo, tree)
+
+	def _parse(self, s, lexer = False, memo = None, tree = "node",
+				symbol = None, start = None):
+		"""
+		Implements :meth:`parse`, applying nonterminal ``symbol`` instead
+		of the goal if given.
+
+		With ``start``, parsing begins at this offset and needn't reach the
+		end of the input: The tree is returned with the offset behind it,
+		or None if only ignored input is left. ``stats["reach"]`` is then
+		set to the furthest offset the parser looked at, and
+		``stats["furthest"]`` to the furthest offset a nonterminal was
+		applied to, where a parse error would be reported.
+		"""
+
+		lrstack = []
+		heads = {}
+
+		def flatten(seq):
+			"""
+			Flattens the nested result lists of non-emitting nonterminals
+			into one list of nodes, without recursion.
+			"""
+			res = []
+			stack = [iter(seq)]
+
+			while stack:
+				for item in stack[-1]:
+					if isinstance(item, list):
+						stack.append(iter(item))
+						break
+
+					res.append(item)
+				else:
+					stack.pop()
+
+			return res
+
+		g = self._compiled or self.compile()
+		goal = g.goal if symbol is None else g.ids[symbol]
+
+		if lexer and not isinstance(s, TokenStream):
+			s = g.tokenize(s)
+
+		NONTERM = g.NONTERM
+		STRING = g.STRING
+		REGEX = g.REGEX
+		MARK = g.MARK
+
+		names = g.names
+		tokens = g.tokens
+		emits = g.emits
+		rules = g.rules
+		ignores = [(g.kinds[sid], sid) for sid in g.ignores]
+		dispatch = g.dispatch
+		tdispatch = g.tdispatch
+
+		# Statistics: alternatives, alternatives pruned by lookahead,
+		# furthest offset reached, scanner calls, scanner cache hits
+		counts = [0, 0, 0, 0, 0]
+
+		scanned = {}
+		probed = {}
+		nsyms = len(names)
+		literals = g.literals
+
+		def probe(pos):
+			"""
+			Matches all literal terminals at ``pos`` at once, and returns a
+			dict of their IDs and lengths.
+			"""
+			res = probed[pos] = {}
+
+			for token, sym in literals.get(s[pos:pos + 1], ()):
+				if s.startswith(token, pos):
+					res[sym] = len(token)
+
+			return res
+
+		def scantoken(kind, sym, pos):
+			"""
+			Scan for a token that was previously defined with token(),
+			or a literal terminal. Results are cached per token and offset.
+			"""
+			if kind == STRING:
+				res = probed.get(pos)
+				if res is None:
+					counts[3] += 1
+					res = probe(pos)
+				else:
+					counts[4] += 1
+
+				return res.get(sym, -1)
+
+			key = pos * nsyms + sym
+			res = scanned.get(key)
+			if res is not None:
+				counts[4] += 1
+				return res
+
+			token = tokens[sym]
+			counts[3] += 1
+			res = -1
+
+			if kind == REGEX:
+				ret = token.match(s, pos)
+				if ret:
+					res = ret.end() - pos
+
+			else:
+				ret = token(s, pos)
+				if ret:
+					res = ret
+
+			if memoize[sym]:
+				scanned[key] = res
+
+			return res
+
+		skipped = {}
+		skip = g.skip and g.skip.match
+
+		def scanwhitespace(pos):
+			"""
+			Scan for whitespace that was previously defined by ignore().
+			The result is cached per offset, because backtracking scans the
+			same offsets many times.
+			"""
+			if not ignores:
+				return pos
+
+			res = skipped.get(pos)
+			if res is not None:
+				return res
+
+			if skip:
+				res = skipped[pos] = skip(s, pos).end()
+				return res
+
+			res = pos
+
+			while True:
+				for kind, sym in ignores:
+					ret = scantoken(kind, sym, res)
+					if ret > 0:
+						res += ret
+						break
+				else:
+					break
+
+			skipped[pos] = res
+			return res
+
+		if tree in ["flat", "events"]:
+			# Records (symbol, emit, rule, start, end, children), turned into
+			# a FlatTree or an event stream from the final result.
+			def leaf(sym, pos, res):
+				return (sym, emits[sym], None, pos, pos + res, None)
+
+			def span(sym, start, end, children):
+				return (sym, emits[sym], None, start, end, children)
+
+			def ruled(nterm, emit, count, children):
+				return (nterm, emit, count, -1, -1, children)
+
+		elif tree == "node":
+			def leaf(sym, pos, res):
+				"""
+				Returns a node for token ``sym`` of length ``res`` at ``pos``.
+				"""
+				return Node(names[sym], emits[sym], None, None, None, s, pos, pos + res)
+
+			def span(sym, start, end, children):
+				"""
+				Returns a node for nonterminal ``sym`` matching from ``start``
+				to ``end``.
+				"""
+				return Node(names[sym], emits[sym], None, None, children, s, start, end)
+
+			def ruled(nterm, emit, count, children):
+				"""
+				Returns a node for rule ``count`` of ``nterm`` with an emit.
+				"""
+				return Node(names[nterm], emit, None, count, children)
+
+		elif tree == "value":
+			# Values are boxed into 1-tuples, so flatten() never takes them
+			# for nested result lists.
+			actions = g.actions
+			ruleactions = g.ruleactions
+
+			def leaf(sym, pos, res):
+				"""
+				Returns the value of token ``sym`` of length ``res`` at ``pos``.
+				"""
+				action = actions[sym]
+				if action:
+					return (action(s[pos:pos + res]), )
+
+				return (s[pos:pos + res], )
+
+			def span(sym, start, end, children):
+				"""
+				Returns the value of nonterminal ``sym`` from its children.
+				"""
+				action = actions[sym]
+				if action:
+					return (action(*[child[0] for child in children]), )
+
+				return ((names[sym], [child[0] for child in children]), )
+
+			def ruled(nterm, emit, count, children):
+				"""
+				Returns the value of rule ``count`` of ``nterm`` from its
+				children.
+				"""
+				action = ruleactions.get((nterm, count))
+				if action:
+					return (action(*[child[0] for child in children]), )
+
+				return ((names[nterm], [child[0] for child in children]), )
+
+		else:
+			raise ValueError("Invalid tree '%s'" % tree)
+
+		# Token mode: Positions are indexes into the token stream.
+		if isinstance(s, TokenStream):
+			stream = s
+			s = stream.source
+			tkinds = stream.kinds
+			starts = stream.starts
+			ends = stream.ends
+			length = len(stream)
+
+			def scantoken(kind, sym, pos):
+				if pos < length and tkinds[pos] == sym:
+					return 1
+
+				return -1
+
+			def probe(pos):
+				res = probed[pos] = {tkinds[pos]: 1} if pos < length else {}
+				return res
+
+			def scanwhitespace(pos):
+				return pos
+
+			charleaf = leaf
+			charspan = span
+
+			def leaf(sym, pos, res):
+				return charleaf(sym, starts[pos], ends[pos] - starts[pos])
+
+			def span(sym, start, end, children):
+				if start >= length:
+					start = end = len(s)
+				else:
+					start = starts[start]
+					end = starts[end] if end < length else len(s)
+
+				return charspan(sym, start, end, children)
+
+		else:
+			stream = None
+			length = len(s)
+
+		memo = memo or DictMemo()
+		memo.reset(len(names), length)
+		memoget = memo.get
+		memoset = memo.set
+
+		window = memo.window
+		evictat = [window or 0]
+
+		def evict(off):
+			"""
+			Evicts memo entries behind the window, keeping those at offsets
+			of evaluations in progress.
+			"""
+			low = off - window
+			pinned = set([lr.off for lr in lrstack]) | set(heads.keys())
+
+			memo.evict(low, pinned)
+
+			for pos in list(skipped.keys()):
+				if pos < low:
+					del skipped[pos]
+
+			for key in list(scanned.keys()):
+				if key // nsyms < low:
+					del scanned[key]
+
+			for pos in list(probed.keys()):
+				if pos < low:
+					del probed[pos]
+
+			evictat[0] = off + window
+
+		operators = g.operators
+		binaries = [set([op[4] for op in ops or ()]) for ops in operators]
+		memoize = g.memoize
+		leftrec = g.leftrec
+		silent = g.silent
+
+		def operator(nterm, pos, minprec, forbid):
+			"""
+			Returns the longest operator of ``nterm`` at ``pos`` with a
+			precedence level of at least ``minprec``, and its length.
+			"""
+			op = None
+			oplen = 0
+
+			for item in operators[nterm]:
+				if item[2] < minprec or item[2] == forbid:
+					continue
+
+				res = scantoken(item[1], item[0], pos)
+				if res > oplen:
+					op = item
+					oplen = res
+
+			return op, oplen
+
+		def combine(nterm, start, seq, pos, op, oplen, rhs, end):
+			"""
+			Combines the operands ``seq`` and ``rhs`` of operator ``op`` of
+			``nterm`` into the result of the equivalent left-recursive rule.
+			"""
+			sym, kind, prec, assoc, count, helper = op
+			prods = rules[nterm]
+
+			if helper is None:
+				items, emitrule, emit = prods[count]
+			else:
+				items, emitrule, emit = rules[helper][0]
+
+			res = []
+
+			if items[0][2]:
+				res.append(span(nterm, start, pos, flatten(seq)))
+			elif seq:
+				res.append(seq)
+
+			if items[1][2]:
+				res.append(leaf(sym, pos, oplen))
+
+			if items[2][2]:
+				res.append(span(nterm, scanwhitespace(pos + oplen), end,
+				                flatten(rhs)))
+			elif rhs:
+				res.append(rhs)
+
+			if helper is not None:
+				if emitrule:
+					res = [ruled(helper, emit, 0, flatten(res))]
+
+				items, emitrule, emit = prods[count]
+
+				if items[0][2]:
+					res = [span(helper, start, end, flatten(res))]
+
+			if emitrule:
+				res = [ruled(nterm, emit, count, flatten(res))]
+
+			return res
+
+		def lrstart(nterm, entry):
+			#print("lrstart", names[nterm])
+			lr = entry.res
+
+			if not lr.head:
+				lr.head = _Head(nterm)
+
+			for item in reversed(lrstack):
+				if item.head is lr.head:
+					break
+
+				item.head = lr.head
+				lr.head.involved.add(item.nterm)
+
+		# Steps of the engine
+		CONSUME, NEXT, RETURN, OPERATORS = range(4)
+
+		# Continuations on the engine's stack
+		ITEM, MEMO, RECALL, SEED, GROW, OPERAND, RHS = range(7)
+
+		def run(goal, start):
+			"""
+			Applies nonterminal ``goal`` at offset ``start``, and returns the
+			result and the offset behind it.
+
+			Instead of calling itself for the nonterminals in a rule, the
+			engine saves the state of the current rule as a continuation on
+			its own stack, and resumes it when the nonterminal's result is
+			returned. Continuations also keep the memo entries and
+			left-recursion heads of results to be memoized or grown, and the
+			operands of precedence climbing. The native stack depth is
+			therefore independent of the nesting depth of the input.
+			"""
+			stack = []
+
+			# The goal is applied by a rule of its own
+			nterm = goal
+			off = start
+			prods = None
+			alts = iter(())
+			count = 0
+			items = iter(((NONTERM, goal, False), ))
+			emitrule = False
+			emit = None
+			seq = []
+			pos = start
+			minprec = 0
+			step = NEXT
+
+			while True:
+				if step == CONSUME:
+					# Try to consume any rule of nonterminal nterm starting at
+					# offset off.
+					#print("consume", names[nterm], off)
+					pos = scanwhitespace(off)
+
+					# Select viable rules by lookahead
+					if stream:
+						key = tkinds[pos] if pos < length else -1
+						alts = tdispatch[nterm].get(key)
+						if alts is None:
+							alts = g.viable(nterm, key, tokens=True)
+					else:
+						key = s[pos] if pos < length else None
+						alts = dispatch[nterm].get(key)
+						if alts is None:
+							alts = g.viable(nterm, key)
+
+					# Operator nonterminals are parsed by precedence climbing,
+					# which consumes the other rules as operands, and then
+					# combines them by operators with a precedence level of at
+					# least minprec.
+					if operators[nterm]:
+						stack.append((OPERAND, nterm, off, minprec, pos))
+						minprec = 0
+
+						alts = [count for count in alts if count not in binaries[nterm]]
+
+					prods = rules[nterm]
+					counts[0] += len(prods)
+					counts[1] += len(prods) - len(alts)
+
+					alts = iter(alts)
+					items = None
+					step = NEXT
+
+				if step == NEXT:
+					# Continue with the items of the current rule, or with
+					# the next viable rule.
+					while True:
+						if items is None:
+							for count in alts:
+								break
+							else:
+								seq = None
+								pos = off
+								step = RETURN
+								break
+
+							rule, emitrule, emit = prods[count]
+							items = iter(rule)
+							seq = []
+							pos = off
+
+						for kind, sym, emitted in items:
+							pos = scanwhitespace(pos)
+
+							# Is literal? Look it up in the probe of all
+							# literals at this offset.
+							if kind == STRING:
+								res = probed.get(pos)
+								if res is None:
+									counts[3] += 1
+									res = probe(pos)
+								else:
+									counts[4] += 1
+
+								res = res.get(sym, -1)
+								if res <= 0:
+									break
+
+								if emitted:
+									seq.append(leaf(sym, pos, res))
+
+								pos += res
+								continue
+
+							# Is terminal?
+							elif kind != NONTERM:
+								# Offset of an inlined nonterminal, recorded
+								# for parse errors as if it was applied.
+								if kind == MARK:
+									if pos > counts[2]:
+										counts[2] = pos
+
+										if window and pos >= evictat[0]:
+											evict(pos)
+
+									continue
+
+								res = scantoken(kind, sym, pos)
+								if res <= 0:
+									break
+
+								if emitted:
+									seq.append(leaf(sym, pos, res))
+
+								pos += res
+								continue
+
+							# Nonterminal: Apply it on pos, either by taking
+							# its result from the memo, or by consuming it
+							# and resuming here with the continuation.
+							#print("apply", names[sym], pos)
+							if pos > counts[2] and sym not in silent:
+								counts[2] = pos
+
+								if window and pos >= evictat[0]:
+									evict(pos)
+
+							cont = None
+
+							# Nonterminals that are not memoized are never
+							# left-recursive, and just consumed.
+							if not memoize[sym]:
+								cont = ITEM
+
+							# Nonterminals that can't be left-recursive are
+							# only memoized, without the seed-growing machinery.
+							elif not leftrec[sym]:
+								entry = memoget(sym, pos)
+								if entry is None:
+									cont = (MEMO, sym, pos)
+
+							else:
+								entry = memoget(sym, pos)
+								head = heads.get(pos)
+
+								# Recall the entry, which is evaluated again
+								# when sym is involved into growing a seed here.
+								if head:
+									if (not entry
+										and sym != head.nterm and sym not in head.involved):
+										entry = _Entry(None, pos)
+
+									elif sym in head.evaluate:
+										head.evaluate.discard(sym)
+										cont = (RECALL, sym, pos, entry)
+
+								if cont is None:
+									if entry is None:
+										lr = _Lr(sym, pos)
+										lrstack.append(lr)
+
+										# mark this a fail to avoid left-recursions
+										entry = _Entry(lr, pos)
+										memoset(sym, pos, entry)
+
+										cont = (SEED, sym, pos, lr, entry)
+
+									elif entry.res and isinstance(entry.res, _Lr):
+										lrstart(sym, entry)
+										entry = _Entry(entry.res.seed, entry.pos)
+
+							if cont is not None:
+								stack.append((ITEM, nterm, off, prods, alts, items,
+												count, emitrule, emit, seq, pos,
+												sym, emitted))
+								if cont is not ITEM:
+									stack.append(cont)
+
+								nterm = sym
+								off = pos
+								step = CONSUME
+								break
+
+							if entry.res is None:
+								break
+
+							if emitted:
+								seq.append(span(sym, pos, entry.pos, flatten(entry.res)))
+							elif entry.res:
+								# Nested lists are flattened on demand, to
+								# avoid copying growing sequences over and
+								# over in left-recursive repetitions.
+								seq.append(entry.res)
+
+							pos = entry.pos
+
+						else:
+							pos = scanwhitespace(pos)
+
+							# Insert production-based node?
+							if emitrule:
+								seq = [ruled(nterm, emit, count, flatten(seq))]
+
+							step = RETURN
+							break
+
+						if step == CONSUME:
+							break
+
+						items = None
+
+					if step == CONSUME:
+						continue
+
+				while step == RETURN:
+					# Hand the result seq and pos to the next continuation
+					if not stack:
+						return (seq, pos)
+
+					cont = stack.pop()
+
+					if cont[0] == ITEM:
+						res = seq
+						end = pos
+						(_, nterm, off, prods, alts, items,
+							count, emitrule, emit, seq, pos, sym, emitted) = cont
+
+						if res is None:
+							items = None
+						else:
+							if emitted:
+								seq.append(span(sym, pos, end, flatten(res)))
+							elif res:
+								seq.append(res)
+
+							pos = end
+
+						step = NEXT
+
+					elif cont[0] == MEMO:
+						memoset(cont[1], cont[2], _Entry(seq, pos))
+
+					elif cont[0] == RECALL:
+						cont[3].res = seq
+						cont[3].pos = pos
+
+					elif cont[0] == SEED:
+						_, nterm, off, lr, entry = cont
+						lrstack.pop()
+
+						entry.pos = pos
+
+						if not lr.head:
+							entry.res = seq
 
-					if symdef.select("EMIT"):
-						ident = symdef.select("IDENT", 0)
-						if ident is not None:
-							self.emit(sym, ident.match)
+						# Answer the seed, or grow it if nterm is the head of
+						# the left-recursion.
 						else:
-							self.emit((nonterm, len(self.grammar[nonterm])))
+							#print("lranswer", names[nterm])
+							lr.seed = seq
+							head = entry.res.head
 
-				elif symdef.symbol == "TOKEN":
-					sym = symdef.match[1:-1]
-					self.tokens[sym] = sym
-					self.emits[sym] = None
-				elif symdef.symbol == "REGEX":
-					sym = uniqueName(nonterm.upper())
-					self.token(sym, symdef.match[1:-1])
-					self.emits[sym] = None
-				elif symdef.symbol == "CCL":
-					sym = uniqueName(nonterm.upper())
-					self.token(sym, symdef.match)
-				elif symdef.symbol == "STRING":
-					sym = symdef.match[1:-1]
+							if head.nterm != nterm:
+								seq = entry.res.seed
+								pos = entry.pos
 
-				else:
-					sym = symdef.match
+							else:
+								entry.res = entry.res.seed
 
-				return sym
+								if entry.res is not None:
+									#print("lrgrow", names[nterm])
+									heads[off] = head
+									head.evaluate = set(head.involved)
 
-			def buildNonterminal(nonterm, prods):
-				"""
-				AST traversal function for nonterminals in the BNF-grammar.
-				"""
-				for p in prods:
-					seq = []
+									stack.append((GROW, nterm, off, entry, head))
+									step = CONSUME
 
-					for s in p.children:
-						seq.append(buildSymbol(nonterm, s))
+								else:
+									seq = None
+									pos = entry.pos
 
-					self.grammar[nonterm].append(seq)
+					elif cont[0] == GROW:
+						_, nterm, off, entry, head = cont
 
-			if dump:
-				bnfparser.dump(ast)
+						if seq is None or pos <= entry.pos:
+							del heads[off]
+							seq = entry.res
+							pos = entry.pos
 
-			# Integrate all non-terminals into the grammar.
-			for d in ast.select("nontermdef"):
-				sym = d.select("IDENT", 0).match
-				self.grammar[sym] = []
+						else:
+							entry.res = seq
+							entry.pos = pos
+							head.evaluate = set(head.involved)
 
-			# Now build the grammar
-			nonterm = None
+							stack.append(cont)
+							step = CONSUME
+
+					elif cont[0] == OPERAND:
+						_, nterm, off, minprec, start = cont
+
+						if seq is None:
+							pos = off
+						else:
+							forbid = None
+							step = OPERATORS
 
-			for d in ast.children:
-				if d.check("termdef"):
-					term = d.select("IDENT", 0)
-					if term:
-						term = term.match
 					else:
-						term = self.AUTOTOKNAME % (len(self.tokens.keys()) + 1)
+						_, nterm, off, minprec, start, lhs, opos, op, oplen = cont
 
-					if d.contains("STRING"):
-						dfn = d.select("STRING", 0).match[1:-1]
-					elif d.contains("REGEX"):
-						dfn = re.compile(d.select("REGEX", 0).match[1:-1])
-					elif d.contains("CCL"):
-						dfn = re.compile(d.select("CCL", 0).match)
+						if seq is None:
+							seq = lhs
+							pos = opos
+						else:
+							seq = combine(nterm, start, lhs, opos, op, oplen, seq, pos)
+							forbid = op[2] if op[3] == "nonassoc" else None
+							step = OPERATORS
+
+				if step == OPERATORS:
+					# Take the longest operator allowed here, and climb for
+					# its right-hand side.
+					op, oplen = operator(nterm, pos, minprec, forbid)
+
+					if not op:
+						step = RETURN
 					else:
-						dfn = d.select("IDENT", 1).match
+						stack.append((RHS, nterm, off, minprec, start, seq, pos, op, oplen))
+						off = pos + oplen
+						minprec = op[2] if op[3] == "right" else op[2] + 1
+						step = CONSUME
 
-					if term in self.tokens.keys():
-						raise MultipleDefinitionError(term)
+		def reach():
+			"""
+			Returns the furthest offset looked at, by the nonterminals
+			applied and the scanner caches. Scanners look at the offset
+			behind their match, and a literal at up to its length.
+			"""
+			res = max([counts[2]] + list(skipped.values()))
 
-					self.tokens[term] = dfn
+			for key, ret in scanned.items():
+				res = max(res, key // nsyms + max(ret, 0))
 
-					if d.select("EMIT"):
-						self.emit(term)
-					elif d.select("IGNORE"):
-						self.ignores.append(term)
+			for pos in probed.keys():
+				lits = literals.get(s[pos:pos + 1])
+				if lits:
+					# Literals are sorted longest first
+					res = max(res, pos + len(lits[0][0]) - 1)
+				else:
+					res = max(res, pos)
 
-				else: # d == "nontermdef"
-					nonterm = d.select("IDENT", 0).match
-					buildNonterminal(nonterm, d.select("production"))
+			return res
 
-					if d.select("EMIT"):
-						self.emit(nonterm)
-					if d.select("GOAL"):
-						self.goal = nonterm
+		try:
+			if start is None:
+				ast = _Entry(*run(goal, 0))
+			elif scanwhitespace(start) < length:
+				ast = _Entry(*run(goal, start))
+			else:
+				ast = None
+		finally:
+			self.stats = {
+				"alternatives": counts[0],
+				"pruned": counts[1],
+				"memo": memo.size,
+				"memo_peak": memo.peak,
+				"scans": counts[3],
+				"scan_hits": counts[4]
+			}
+
+			if start is not None:
+				self.stats["reach"] = reach()
+				self.stats["furthest"] = counts[2]
+
+		if ast is None:
+			return None
+
+		if ast.res is None or (start is None and ast.pos < length):
+			# On parse error, take the furthest offset a nonterminal was
+			# applied to
+			last = max(ast.pos, counts[2])
+
+			if stream:
+				last = stream.starts[last] if last < length else len(s)
 
-			# Last nonterminal becomes goal, if not set by flags
-			if not self.goal and nonterm:
-				self.goal = nonterm
+			raise ParseError(s, last)
 
-		if not self.goal:
-			raise GoalSymbolNotDefined()
+		if tree == "flat":
+			if g.emitted[goal]:
+				root = (goal, emits[goal], None, -1, -1, flatten(ast.res))
+			else:
+				root = (-1, None, None, -1, -1, flatten(ast.res))
 
-		#print(self.grammar)
-		#print(self.tokens)
-		#print(self.emits)
+			res = FlatTree.build(root, names, s)
 
+		elif tree == "value":
+			values = [value[0] for value in flatten(ast.res)]
 
-	def token(self, name, token = None, static = False, emit = None):
-		"""
-		Adds a new terminal token ``name`` to the parser.
+			if not g.emitted[goal]:
+				res = values
+			elif g.actions[goal]:
+				res = g.actions[goal](*values)
+			else:
+				res = (names[goal], values)
 
-		:param name: The unique, identifying name of the token to be added.
-		:type name: str
+		elif tree == "events":
+			kinds = g.kinds
 
-		:param token: The token definition that is registered with ``name``.
-			If this is a str, and ``static`` is False, it will be interpreted
-			as regular expression. If omitted, ``token`` is set to ``name`` as
-			static string.
-		:type token: str | re | callable
+			if g.emitted[goal]:
+				seq = [(goal, emits[goal], None, -1, -1, flatten(ast.res))]
+			else:
+				seq = flatten(ast.res)
 
-		:param static: If True, ``token`` is direcly taken as is, and not
-			interpreted as a regex str.
+			def events(stack):
+				"""
+				Yields the events of the records on ``stack`` in document
+				order, without recursion.
+				"""
+				while stack:
+					record, exit = stack.pop()
+					sym, emit, rule, start, end, children = record
 
-		:param emit: If set, the token is configured to be emitted.
-		:type emit: bool | str | callable
-		"""
+					if start < 0:
+						start = end = None
 
-		if isinstance(name, list):
-			for n in name:
-				self.token(n, token=token, static=static)
+					if exit:
+						yield ("exit", names[sym], emit, rule, start, end)
+					elif kinds[sym] != NONTERM:
+						yield ("token", names[sym], emit, rule, start, end)
+					else:
+						yield ("enter", names[sym], emit, rule, start, end)
 
-			return
+						stack.append((record, True))
+						if children:
+							stack.extend([(child, False) for child in reversed(children)])
 
-		if name in self.tokens.keys() or name in self.grammar.keys():
-			raise MultipleDefinitionError(name)
+			res = events([(record, False) for record in reversed(seq)])
+
+		elif g.emitted[goal]:
+			res = Node(names[goal], emits[goal], children = flatten(ast.res))
 
-		if token:
-			if not static and isinstance(token, str):
-				token = re.compile(token)
 		else:
-			token = str(name)
+			res = Node(children=flatten(ast.res)) #Return an empty node with children.
 
-		self.tokens[name] = token
+		if start is None:
+			return res
 
-		if emit:
-			self.emits[name] = emit if not isinstance(emit, bool) else None
+		return res, ast.pos
 
-	def ignore(self, token, static = False):
+	def parse_events(self, s, handler = None, lexer = False, memo = None):
 		"""
-		Adds a new ignore terminal (whitespace) to the parser.
+		Parse ``s`` like :meth:`parse`, but report the emitted symbols as
+		events instead of returning an abstract syntax tree.
+
+		Events are tuples ``(event, symbol, emit, rule, start, end)`` in
+		document order, where ``event`` is ``"enter"`` and ``"exit"``
+		around the children of a nonterminal, or ``"token"`` for a
+		terminal. ``rule`` is the rule index of rule emits, and ``start``
+		and ``end`` are the offsets of the match in the input, which are
+		None for rule emits and the goal symbol.
+
+		Events are only reported for the successful parse, after the
+		input has been parsed completely. No :class:`pynetree.Node`
+		objects are created.
+
+		:param s: The input string to be parsed, or a token stream.
+		:param handler: An object providing the methods ``enter()``,
+			``exit()`` and ``token()``, which are called with the event
+			tuple without ``event``. Missing methods are skipped.
+		:param lexer: Parse in lexer-first mode, see :meth:`parse`.
+		:param memo: The memo table to be used, see :meth:`parse`.
+
+		:returns: A generator of events if no handler is given, else the
+			handler.
+		"""
+		events = self.parse(s, lexer=lexer, memo=memo, tree="events")
 
-		:param token: The token definition of the whitespace symbol.
-			If this is a str, and ``static`` is False, it will be interpreted
-			as regular expression.
-		:type token: str | re | callable
+		if handler is None:
+			return events
 
-		:param static: If True, ``token`` is direcly taken as is, and not
-			interpreted as a regex str.
-		"""
+		callbacks = {}
 
-		name = self.AUTOTOKNAME % len(self.tokens.keys())
-		self.token(name, token, static)
-		self.ignores.append(name)
+		for event in events:
+			callback = callbacks.get(event[0], False)
+			if callback is False:
+				callback = callbacks[event[0]] = getattr(handler, event[0], None)
 
-	def emit(self, name, emit = None):
-		"""
-		Defines which symbols of the grammar shall be emitted in the
-		generated, abstract syntax tree (AST).
+			if callback:
+				callback(*event[1:])
 
-		:param name: The name of the symbol that shall be emitted.
-			Alternatively, a list of symbol names is accepted.
-		:type name: str | list
+		return handler
 
-		:param emit: An emit string that is used instead of the symbol
-						name. This can also be a callable, which is
-						called using AST traversal. If omitted, the
-						symbol's name is used as emit.
-		:type action: str | callable
+	def parse_iter(self, source, symbol, tree = "node", size = 65536):
 		"""
-		if isinstance(name, list):
-			for n in name:
-				self.emit(n, emit)
-
-			return
+		Parse ``source`` as a sequence of records, each matching the
+		nonterminal ``symbol``, and yield the abstract syntax tree of every
+		record as soon as it is parsed.
+
+		This is meant for long inputs made of many independent top-level
+		constructs, like the statements of a program. Each record is parsed
+		with a new memo table, which is dropped afterwards, and files are
+		read in blocks of ``size`` characters, of which only the input not
+		yet parsed is kept. The memory used is therefore independent of the
+		length of the input.
+
+		A record is only taken, and a parse error only reported, when more
+		than ``size`` characters were read behind the furthest offset the
+		parser looked at, or the input is at its end; otherwise, more input
+		is read and the record is parsed again. Tokens and ignored input
+		therefore must not be longer than ``size`` characters, and callable
+		tokens must not look behind their match.
+
+		The trees of the records are those :meth:`parse` returns for
+		``symbol`` as goal. Their offsets refer to the block of input they
+		were parsed from, which is :attr:`pynetree.Node.source`. Ignored
+		input between records is skipped. Parse errors report the offset,
+		line and column in the entire input.
+
+		:param source: The input, as a string or a file object opened in
+			text mode.
+		:param symbol: The name of the nonterminal matching one record.
+		:param tree: The kind of trees to be yielded, see :meth:`parse`.
+		:param size: The number of characters to be read from a file at
+			once.
+
+		:returns: A generator of the records' trees.
+		"""
+		if not symbol in self.grammar.keys():
+			raise SymbolNotFoundError(symbol)
 
-		if isinstance(name, tuple):
-			testname = name[0]
+		if hasattr(source, "read"):
+			buf = ""
+			eof = False
 		else:
-			testname = name
-
-		if (not testname in self.grammar.keys()
-			and not testname in self.tokens.keys()):
-			raise SymbolNotFoundError(testname)
+			buf = source
+			eof = True
 
-		self.emits[name] = emit
+		pos = 0		# offset of the next record in buf
+		base = 0	# offset, line and column of buf in the input
+		line = 1
+		column = 1
+		furthest = 0	# furthest offset in the input a nonterminal was applied to
 
-	def parse(self, s):
+		while True:
+			try:
+				res = self._parse(buf, tree=tree, symbol=symbol, start=pos)
+				error = None
+			except ParseError as e:
+				error = e
+
+			if eof or len(buf) - self.stats["reach"] > size:
+				# Errors are reported at the furthest offset of all records,
+				# as parse() does, which may be in a record taken before.
+				if error:
+					raise ParseError(buf, max(error.offset, furthest - base),
+										base, line, column)
+
+				# Only ignored input is left
+				if res is None:
+					return
+
+				# An empty record doesn't advance
+				if res[1] == pos:
+					raise ParseError(buf, max(pos, furthest - base), base, line, column)
+
+				furthest = max(furthest, base + self.stats["furthest"])
+
+				yield res[0]
+				pos = res[1]
+				continue
+
+			# Read at least as much as is left, so that long records are
+			# parsed again only a few times
+			block = source.read(max(size, len(buf) - pos))
+			if not block:
+				eof = True
+
+			# Drop the input parsed so far
+			done = buf[:pos]
+			nl = done.rfind("\n")
+
+			if nl < 0:
+				column += len(done)
+			else:
+				line += done.count("\n")
+				column = len(done) - nl
+
+			base += len(done)
+			buf = buf[pos:] + block
+			pos = 0
+
+	def parse_many(self, inputs, workers = None, chunksize = 1, ordered = True,
+					lexer = False, tree = "node"):
 		"""
-		Parse ``s`` with the currently defined grammar.
+		Parse many inputs by a pool of worker processes.
+
+		The parser is compiled and pickled once, and every worker process
+		unpickles it once on start; only the inputs and results are passed
+		per task. Parse errors and results that can't be pickled don't abort
+		the batch, but are reported as results. Invalid arguments and
+		parsers that can't be pickled are reported on the call.
+
+		:param inputs: An iterable of input strings.
+		:param workers: The number of worker processes, which defaults to
+			the number of CPUs.
+		:param chunksize: The number of inputs sent to a worker at once.
+			Larger chunks save inter-process communication on many small
+			inputs.
+		:param ordered: If True, the results are yielded in the order of
+			the inputs, else as soon as they are completed.
+		:param lexer: Parse in lexer-first mode, see :meth:`parse`.
+		:param tree: The kind of trees to be returned, see :meth:`parse`.
+			Event generators can't be passed between processes.
+
+		:returns: A generator of tuples of the index of an input, and its
+			abstract syntax tree, or the :class:`pynetree.ParseError` or
+			:class:`pickle.PicklingError` raised.
+		"""
+		import multiprocessing, pickle
 
-		This invokes the parser on a given input, and returns the
-		abstract syntax tree of this input on success.
+		if tree == "events":
+			raise ValueError("Invalid tree '%s' for parse_many()" % tree)
 
-		The parser is implemented as a modified packrat parsing algorithm,
-		with support of left-recursive grammars.
+		self._compiled or self.compile()
+		data = pickle.dumps(self, 2)
 
-		:param s: The input string to be parsed.
-		:param s: str
+		def run():
+			pool = multiprocessing.Pool(workers, _startworker, (data, lexer, tree))
+			done = False
 
-		:returns: Abstract syntax tree, None on error.
-		:rtype: list | tuple
-		"""
+			try:
+				if ordered:
+					results = pool.imap(_runworker, enumerate(inputs), chunksize)
+				else:
+					results = pool.imap_unordered(_runworker, enumerate(inputs), chunksize)
 
-		class Entry(object):
-			def __init__(self, res = None, pos = 0):
-				self.res = res
-				self.pos = pos
+				# Results are pickled by the workers themselves, so that a
+				# result that can't be pickled fails on its own.
+				for index, res in results:
+					yield index, pickle.loads(res)
 
-		class Lr(object):
-			def __init__(self, nterm, seed = None, head = None):
-				self.nterm = nterm
-				self.seed = seed	# The initial parse seed
-				self.head = head	# Refers to the head
+				done = True
 
-		class Head(object):
-			def __init__(self, nterm):
-				self.nterm = nterm
-				self.involved = []	# nterminals involved into left-recursion
-				self.evaluate = []	# subset of involved non-terminals that may
-									# be evaluated
+			finally:
+				if done:
+					pool.close()
+				else:
+					pool.terminate()
 
-		memo = {}
-		lrstack = []
-		heads = {}
+				pool.join()
 
-		def apply(nterm, off):
-			"""
-			Apply nonterminal ``nterm`` on offset ``off``.
-			"""
+		return run()
 
-			def scantoken(sym, s, pos):
-				"""
-				Scan for a token that was previously defined with token().
-				"""
-				if isinstance(self.tokens[sym], str):
-					if s.startswith(self.tokens[sym], pos):
-						return len(self.tokens[sym])
+	def traverse(self, node, prePrefix = "pre_", passPrefix = "pass_", postPrefix = "post_", *args, **kwargs):
+		"""
+		Generic AST traversal function.
 
-				elif callable(self.tokens[sym]):
-					res = self.tokens[sym](s, pos)
-					if res:
-						return res
+		This function allows to walk over the generated abstract syntax tree created by :meth:`pynetree.Parser.parse`
+		and calls functions before, by iterating over and after the node are walked.
 
-				else:
-					res = self.tokens[sym].match(s[pos:])
-					if res and s.startswith(res.group(0), pos):
-						return len(res.group(0))
+		The functions are looked up once per symbol and rule in a dispatch
+		table, and the tree is walked without recursion.
 
-				return -1
+		:param node: The tree node to print.
+		:param prePrefix: Prefix for pre-processed functions, named prePrefix + symbol.
+		:param passPrefix: Prefix for functions processed by passing though children, named passPrefix + symbol.
+		:param postPrefix: Prefix for post-processed functions, named postPrefix + symbol.
+		:param args: Arguments passed to these functions as *args.
+		:param kwargs: Keyword arguments passed to these functions as **kwargs.
+		"""
+		# Names of the candidate functions, collected once per class
+		prefixes = (prePrefix, passPrefix, postPrefix)
+		key = (self.__class__, prefixes)
 
-			def scanwhitespace(s, pos):
-				"""
-				Scan for whitespace that was previously defined by ignore().
-				"""
-				while True:
-					i = 0
-					for sym in self.ignores:
-						res = scantoken(sym, s, pos)
-						if res > 0:
-							pos += res
-							break
+		names = Parser._handlers.get(key)
+		if names is None:
+			names = Parser._handlers[key] = frozenset(
+				[name for name in dir(self.__class__)
+					if name.startswith(prefixes)
+						and callable(getattr(self.__class__, name))])
 
-						i += 1
+		# Functions can also be set on the object
+		names = names | frozenset([name for name, value in self.__dict__.items()
+									if name.startswith(prefixes) and callable(value)])
 
-					if i == len(self.ignores):
-						break
+		table = {}
 
-				return pos
+		def resolve(prefix, node):
+			"""
+			Returns the functions for ``node`` with ``prefix``, as a list of
+			the function for the symbol, and for the symbol and rule, each
+			with a dict of functions per loop index.
+			"""
+			key = (prefix, node.emit or node.symbol, node.rule)
+			res = table.get(key)
+			if res is not None:
+				return res
 
-			def consume(nterm, off):
-				"""
-				Try to consume any rule of non-terminal ``nterm``
-				starting at offset ``off``.
-				"""
-				#print("consume", nterm, off)
-				count = 0
-				for rule in self.grammar[nterm]:
-					sym = None
-					seq = []
-					pos = off
+			res = table[key] = []
 
-					for sym in rule:
-						pos = scanwhitespace(s, pos)
+			if not (node.emit or node.symbol):
+				return res
 
-						# Is known terminal?
-						if sym in self.tokens.keys():
-							res = scantoken(sym, s, pos)
-							if res <= 0:
-								break
+			fname = "%s%s" % (prefix, node.emit or node.symbol)
+			fnames = [fname]
 
-							if sym in self.emits.keys():
-								seq.append(Node(sym, self.emits[sym],
-								                s[pos:pos + res]))
+			if node.rule is not None:
+				fnames.append("%s_%d" % (fname, node.rule))
 
-							pos += res
+			for fname in fnames:
+				loops = {}
 
-						# Is unknown terminal?
-						elif not sym in self.grammar.keys():
-							if not s[pos:].startswith(sym):
-								break
+				for name in names:
+					if name.startswith(fname + "_"):
+						loop = name[len(fname) + 1:]
+						if loop.isdigit() and str(int(loop)) == loop:
+							loops[int(loop)] = getattr(self, name)
 
-							pos += len(sym)
+				res.append((getattr(self, fname) if fname in names else None, loops))
 
-						# Is nonterminal?
-						else:
-							res = apply(sym, pos)
+			return res
 
-							if res.res is None:
-								break
+		def perform(prefix, node, loop = None):
+			for function, loops in resolve(prefix, node):
+				if function is None and loop is not None:
+					function = loops.get(loop)
 
-							if sym in self.emits.keys():
-								seq.append(Node(sym, self.emits[sym],
-								                s[pos:pos + res.pos],
-								                children = res.res))
-							elif isinstance(res.res, Node):
-								seq.append(res.res)
-							elif isinstance(res.res, list):
-								seq += res.res
+				if function is not None:
+					if loop is None:
+						function(node, *args, **kwargs)
+					else:
+						function(node, _loopIndex=loop, *args, **kwargs)
 
-							pos = res.pos
+					return True
 
-						sym = None
+			return False
 
-					if not sym:
-						pos = scanwhitespace(s, pos)
+		emits = self.emits
 
-						# Insert production-based node?
-						if (nterm, count) in self.emits.keys():
-							seq = [Node(nterm, self.emits[(nterm, count)], rule = count, children = seq)]
+		def post(node):
+			if not perform(postPrefix, node):
 
-						return (seq, pos)
+				# Allow for post-process function in the emit info.
+				emit = emits.get(node.key)
 
-					count += 1
+				if callable(emit):
+					emit(node, *args, **kwargs)
 
-				return (None, off)
+				# Else, just dump the emitting value.
+				elif emit:
+					print(emit)
 
-			def lrgrow(entry, head):
-				#print("lrgrow", nterm)
-				heads[off] = head
+		# Pre-processing function
+		perform(prePrefix, node)
 
-				while True:
-					pos = off
-					head.evaluate = list(head.involved)
+		# Every node on the stack is kept with the iterator over its
+		# children and its own index in its parent's children.
+		stack = [(node, enumerate(node._children or ()), None)]
 
-					res, pos = consume(nterm, pos)
-					if res is None or pos <= entry.pos:
-						break
+		while stack:
+			node, children, loop = stack[-1]
 
-					entry.res = res
-					entry.pos = pos
+			# Run through the children.
+			for count, child in children:
+				perform(prePrefix, child)
+				stack.append((child, enumerate(child._children or ()), count))
+				break
 
-				del heads[off]
-				return entry
+			else:
+				stack.pop()
 
-			def lrstart(entry):
-				#print("lrstart", nterm)
-				lr = entry.res
+				# Post-processing function
+				post(node)
 
-				if not lr.head:
-					lr.head = Head(nterm)
+				# Pass-processing function of the parent
+				if stack:
+					perform(passPrefix, stack[-1][0], loop)
 
-				for item in reversed(lrstack):
-					if item.head == lr.head:
-						break
+class ParseSession(object):
+	"""
+	Keeps a parsed text, and reparses it incrementally after edits.
+
+	The text is parsed as a sequence of records matching the nonterminal
+	``symbol``, like by :meth:`pynetree.Parser.parse_iter`. For every record,
+	the session keeps its tree and the range of input its parse looked at.
+	:meth:`update` replaces a part of the text, and only reparses the
+	records that looked at the replaced input, until a reparsed record ends
+	where a record that is still valid begins. The records behind the edit
+	are kept and only moved, so the time of an update depends on the size
+	of the edit and the records around it, not on the length of the text.
+
+	The nodes of every record refer to the text of that record only: Their
+	:attr:`pynetree.Node.source` is the record's text, and their offsets are
+	relative to it. :attr:`records` holds the offsets of the records in the
+	entire text.
+	"""
 
-					item.head = lr.head
-					lr.head.involved.append(item.nterm)
+	def __init__(self, parser, s, symbol):
+		"""
+		Parses ``s`` with ``parser`` as a sequence of ``symbol`` records.
 
-			def lranswer(entry):
-				#print("lranswer", nterm)
+		:param parser: The :class:`pynetree.Parser` to be used.
+		:param s: The initial text.
+		:param symbol: The name of the nonterminal matching one record.
+		"""
+		if not symbol in parser.grammar.keys():
+			raise SymbolNotFoundError(symbol)
 
-				head = entry.res.head
-				if head.nterm != nterm:
-					return Entry(entry.res.seed, entry.pos)
+		self.parser = parser
+		self.symbol = symbol
+		self.text = ""
 
-				entry.res = entry.res.seed
-				if entry.res is None:
-					return Entry(None, entry.pos)
+		#: The records in text order, as lists of their start and end
+		#: offset, the furthest offset their parse looked at, and their tree.
+		self.records = []
 
-				return lrgrow(entry, head)
+		self._restart = None	# offset to resume parsing at after an error
+		self._tree = None
 
-			def recall():
-				entry = memo.get((nterm, off))
-				head = heads.get(off)
+		self.update(0, 0, s)
 
-				if not head:
-					return entry
+	@property
+	def tree(self):
+		"""
+		The abstract syntax tree of the text, as a :class:`pynetree.Node`
+		with the nodes of all records as children, or None if the last
+		update failed.
+		"""
+		if self._restart is not None:
+			return None
 
-				if (not entry
-					and nterm not in [head.nterm] + head.involved):
-					return Entry(None, off)
+		if self._tree is None:
+			children = []
 
-				if nterm in head.evaluate:
-					head.evaluate.remove(nterm)
-					entry.res, entry.pos = consume(nterm, off)
+			for record in self.records:
+				if record[3].symbol is None:
+					children.extend(record[3].children)
+				else:
+					children.append(record[3])
 
-				return entry
+			self._tree = Node(children=children)
 
-			entry = recall()
+		return self._tree
 
-			if entry is None:
-				lr = Lr(nterm)
-				lrstack.append(lr)
+	def update(self, start, end, text):
+		"""
+		Replaces the text between the offsets ``start`` and ``end`` by
+		``text``, and reparses the records affected.
 
-				# mark this a fail to avoid left-recursions
-				memo[(nterm, off)] = entry = Entry(lr, off)
+		A record is affected if its parse looked at the replaced input,
+		which is the furthest offset scanned (see
+		:meth:`pynetree.Parser.parse_iter`). On a parse error, the edit is
+		kept, and the next update resumes at the failed record.
 
-				res, pos = consume(nterm, off)
+		:param start: Offset of the first character to be replaced.
+		:param end: Offset behind the last character to be replaced.
+		:param text: The new text.
 
-				lrstack.pop()
+		:returns: The new abstract syntax tree, see :attr:`tree`.
+		"""
+		if not 0 <= start <= end <= len(self.text):
+			raise ValueError("Invalid range %d:%d" % (start, end))
+
+		delta = len(text) - (end - start)
+		s = self.text = self.text[:start] + text + self.text[end:]
+		self._tree = None
+
+		# Records in front of the first one that looked at the edit, or
+		# that failed to parse, are kept as they are.
+		old = self.records
+		restart = self._restart
+		count = 0
+
+		for record in old:
+			if (record[2] >= start or record[1] > start
+				or (restart is not None and record[0] >= restart)):
+				break
 
-				entry.pos = pos
-				if lr.head:
-					lr.seed = res
-					return lranswer(entry)
+			count += 1
 
-				entry.res = res
+		records = old[:count]
+		pos = records[-1][1] if records else 0
 
-			elif entry.res and isinstance(entry.res, Lr):
-				lrstart(entry)
-				return Entry(entry.res.seed, entry.pos)
+		# Any other record still valid can be taken again when a reparsed
+		# record ends where it begins. Records behind the edit are moved.
+		tail = []
 
-			return entry
+		for record in old[count:]:
+			if record[0] >= end:
+				tail.append([record[0] + delta, record[1] + delta,
+								record[2] + delta, record[3]])
+			elif record[2] < start and record[1] <= start:
+				tail.append(record)
 
-		ast = apply(self.goal, 0)
-		if not ast or ast.pos < len(s):
-			# On parse error, try to find longest match from memo cache
-			last = ast.pos if ast else 0
+		parser = self.parser
+		count = 0
 
-			for (nterm, off) in memo.keys():
-				if off > last:
-					last = off
+		while True:
+			while count < len(tail) and tail[count][0] < pos:
+				count += 1
 
-			raise ParseError(s, last)
+			if count < len(tail) and tail[count][0] == pos:
+				records.append(tail[count])
+				pos = tail[count][1]
+				continue
 
-		if self.goal in self.emits.keys():
-			return Node(self.goal, self.emits[self.goal], children = ast.res)
+			try:
+				res = parser._parse(s, symbol=self.symbol, start=pos)
 
-		return Node(children=ast.res) #Return an empty node with children.
+				# Only ignored input is left
+				if res is None:
+					break
 
-	def traverse(self, node, prePrefix = "pre_", passPrefix = "pass_", postPrefix = "post_", *args, **kwargs):
-		"""
-		Generic AST traversal function.
+				# An empty record doesn't advance
+				if res[1] == pos:
+					raise ParseError(s, pos)
 
-		This function allows to walk over the generated abstract syntax tree created by :meth:`pynetree.Parser.parse`
-		and calls functions before, by iterating over and after the node are walked.
+			except ParseError:
+				self.records = records + tail[count:]
+				self._restart = pos
+				raise
 
-		:param node: The tree node to print.
-		:param prePrefix: Prefix for pre-processed functions, named prePrefix + symbol.
-		:param passPrefix: Prefix for functions processed by passing though children, named passPrefix + symbol.
-		:param postPrefix: Prefix for post-processed functions, named postPrefix + symbol.
-		:param args: Arguments passed to these functions as *args.
-		:param kwargs: Keyword arguments passed to these functions as **kwargs.
-		"""
-		def perform(prefix, loop = None, *args, **kwargs):
-			if not (node.emit or node.symbol):
-				return False
+			tree, length = res
+			records.append([pos, length, parser.stats["reach"],
+							self._relocate(tree, s[pos:length], pos)])
+			pos = length
 
-			if loop is not None:
-				kwargs["_loopIndex"] = loop
+		self.records = records
+		self._restart = None
 
-			for x in range(0, 2):
-				if x == 0:
-					fname = "%s%s" % (prefix, node.emit or node.symbol)
-				else:
-					if node.rule is None:
-						break
+		return self.tree
+
+	@staticmethod
+	def _relocate(tree, source, offset):
+		"""
+		Makes the nodes of ``tree`` refer to ``source``, which starts at
+		``offset`` of their current source.
+		"""
+		stack = [tree]
 
-					fname = "%s%s_%d" % (prefix, node.emit or node.symbol, node.rule)
+		while stack:
+			node = stack.pop()
 
-				if fname and fname in dir(self) and callable(getattr(self, fname)):
-					getattr(self, fname)(node, *args, **kwargs)
-					return True
+			if node.source is not None:
+				node.source = source
+				node.start -= offset
+				node.end -= offset
 
-				elif loop is not None:
-					fname += "_%d" % loop
+			if node._children:
+				stack.extend(node._children)
 
-					if fname and fname in dir(self) and callable(getattr(self, fname)):
-						getattr(self, fname)(node, *args, **kwargs)
-						return True
+		return tree
 
-			return False
+# State of parse_many() worker processes
+_worker = None
 
-		# Pre-processing function
-		perform(prePrefix, *args, **kwargs)
+def _startworker(data, lexer, tree):
+	"""
+	Initializes a parse_many() worker with the pickled parser ``data``.
+	"""
+	import pickle
 
-		# Run through the children.
-		for count, i in enumerate(node.children):
-			self.traverse(i, prePrefix, passPrefix, postPrefix, *args, **kwargs)
+	global _worker
+	_worker = (pickle.loads(data), lexer, tree)
 
-			# Pass-processing function
-			perform(passPrefix, loop=count, *args, **kwargs)
+def _runworker(task):
+	"""
+	Parses the input of ``task`` in a parse_many() worker, and returns
+	its index and the pickled result.
+	"""
+	import pickle
 
-		# Post-processing function
-		if not perform(postPrefix, *args, **kwargs):
+	index, s = task
+	parser, lexer, tree = _worker
 
-			# Allow for post-process function in the emit info.
-			if callable(self.emits[node.key]):
-				self.emits[node.key](node, *args, **kwargs)
+	try:
+		res = parser.parse(s, lexer=lexer, tree=tree)
+	except ParseError as e:
+		res = e
 
-			# Else, just dump the emitting value.
-			elif self.emits[node.key]:
-				print(self.emits[node.key])
+	try:
+		return index, pickle.dumps(res, pickle.HIGHEST_PROTOCOL)
+	except (pickle.PicklingError, AttributeError, TypeError) as e:
+		return index, pickle.dumps(pickle.PicklingError(
+			"Result of input %d can't be pickled: %s" % (index, e)), 2)
 
 def main():
 	import argparse, sys
@@ -784,16 +4712,23 @@ def main():
 	ap.add_argument("grammar", type=str, help="Grammar to create a parser from.")
 	ap.add_argument("input", type=str, nargs="*", help="Input to be processed by the parser.")
 
+	ap.add_argument("-c", "--cache", help="Cache grammars compiled from definitions in CACHE", metavar="CACHE")
 	ap.add_argument("-d", "--debug", help="Verbose, and print debug output", action="store_true")
+	ap.add_argument("-f", "--format", help="Output format of ASTs (default: text)",
+					choices=["text", "json", "sexpr"], default="text")
+	ap.add_argument("-g", "--generate", help="Write a parser module generated from the grammar to MODULE", metavar="MODULE")
+	ap.add_argument("-O", "--optimize", help="Optimize the grammar before parsing", action="store_true")
 	ap.add_argument("-v", "--verbose", help="Print processing information during run", action="store_true")
 	ap.add_argument("-V", "--version", action="version", version="pynetree %s" % __version__)
+	ap.add_argument("--no-match", help="Don't output the matches of leaves", action="store_true")
+	ap.add_argument("--offsets", help="Output the start and end offsets of matches", action="store_true")
 
 	args = ap.parse_args()
 	verbose = args.verbose or args.debug
 
 	# Try to read grammar from a file.
 	try:
-		f = open(args.grammar, "rb")
+		f = open(args.grammar, "r")
 		gfile = args.grammar
 
 		if verbose:
@@ -807,12 +4742,22 @@ def main():
 		grammar = args.grammar
 
 	try:
-		p = Parser(grammar, args.debug)
+		p = Parser(grammar, args.debug, args.optimize, args.cache)
 
 	except ParseError as e:
 		print(("%s: " % gfile) + str(e))
 		sys.exit(1)
 
+	if args.generate:
+		f = open(args.generate, "w")
+		f.write(p.generate())
+		f.close()
+
+		if verbose:
+			print("Parser module written to '%s'" % args.generate)
+
+		return
+
 	cnt = 0
 	hasInput = bool(args.input)
 
@@ -828,7 +4773,7 @@ def main():
 
 			# Try to read input from a file.
 			try:
-				f = open(input, "rb")
+				f = open(input, "r")
 				ifile = input
 
 				input = f.read()
@@ -860,7 +4805,7 @@ def main():
 			ast = None
 
 		if ast:
-			ast.dump()
+			ast.dump(format=args.format, match=not args.no_match, offsets=args.offsets)
 
 if __name__ == "__main__":
 	main()
@@ -0,0 +1,61 @@
+#-*- coding: utf-8 -*-
+# Checks that deeply nested inputs parse without recursing by nesting depth.
+# The recursion limit is left at its default, far below the depth parsed.
+
+import os, sys, unittest, warnings
+
+from pynetree import Parser
+
+examples = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples")
+
+def measure(node):
+	nodes = 0
+	depth = 0
+	stack = [(node, 0)]
+
+	while stack:
+		node, level = stack.pop()
+		nodes += 1
+		depth = max(depth, level)
+		stack.extend([(child, level + 1) for child in node.children])
+
+	return nodes, depth
+
+class NestingTest(unittest.TestCase):
+	depth = 5000
+
+	@classmethod
+	def setUpClass(cls):
+		with open(os.path.join(examples, "xpl.py")) as f:
+			src = f.read()
+
+		cls.parser = Parser(src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\"))
+
+	def parse(self, s, lexer = False):
+		self.assertLess(sys.getrecursionlimit(), self.depth)
+		return measure(self.parser.parse(s, lexer = lexer))
+
+	def test_blocks(self):
+		n = self.depth
+		self.assertEqual(self.parse("{" * n + "x = 1;" + "}" * n), (5, 2))
+
+	def test_parens(self):
+		n = self.depth
+		self.assertEqual(self.parse("x = " + "(" * n + "1" + ")" * n + ";"), (5, 2))
+
+	def test_calls(self):
+		n = self.depth
+		s = "x = " + "f(" * n + "1" + ")" * n + ";"
+
+		self.assertEqual(self.parse(s), (2 * n + 5, n + 2))
+
+		with warnings.catch_warnings():
+			warnings.simplefilter("ignore")	# INTEGER overlaps IDENT
+			self.assertEqual(self.parse(s, lexer = True), (2 * n + 5, n + 2))
+
+	def test_statements(self):
+		n = self.depth
+		self.assertEqual(self.parse("x = 1;\n" * n), (4 * n + 1, 2))
+
+if __name__ == "__main__":
+	unittest.main()
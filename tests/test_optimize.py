@@ -0,0 +1,119 @@
+#-*- coding: utf-8 -*-
+# Checks that the grammar optimizer (Parser(..., optimize=True)) keeps ASTs
+# and the offsets of parse errors identical to the unoptimized grammar.
+
+import os, random, unittest
+
+from pynetree import Parser, ParseError
+
+examples = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples")
+
+def shape(node):
+	res = []
+	stack = [(node, 0)]
+
+	while stack:
+		node, depth = stack.pop()
+		res.append((depth, node.symbol, node.emit, node.rule, node.match))
+		stack.extend([(child, depth + 1) for child in reversed(node.children or [])])
+
+	return res
+
+def result(p, s):
+	try:
+		return shape(p.parse(s))
+	except ParseError as e:
+		return e.offset
+
+def mutate(rnd, s):
+	pos = rnd.randint(0, len(s))
+	return s[:pos] + rnd.choice(["", ";", "(", ")", "]", "<", "x"]) + s[pos + 1:]
+
+class OptimizeTest(unittest.TestCase):
+	count = 40
+
+	def check(self, build, inputs):
+		plain = build(False)
+		optimized = build(True)
+
+		for s in inputs:
+			self.assertEqual(result(plain, s), result(optimized, s), "input %r" % s)
+
+	def corpus(self, generate):
+		rnd = random.Random(1)
+		inputs = [generate(rnd) for i in range(self.count)]
+
+		return inputs + [mutate(rnd, s) for s in inputs]
+
+	def test_xpl(self):
+		with open(os.path.join(examples, "xpl.py")) as f:
+			src = f.read()
+
+		grammar = src.split('p = Parser(\n"""')[1].split('""")')[0].replace("\\\\", "\\")
+		program = src.split('p.parse("""')[1].split('""")')[0]
+
+		def generate(rnd):
+			return program + "".join(["i = %d; if (i <= %d) j = f(i, -i * %d); else { k = i; }\n"
+										% (rnd.randint(0, 99), rnd.randint(0, 99),
+											rnd.randint(0, 99))
+											for i in range(rnd.randint(0, 5))])
+
+		self.check(lambda optimize: Parser(grammar, optimize = optimize),
+					self.corpus(generate))
+
+	def test_calc(self):
+		grammar = {
+			"factor": ["@INT", "( expr )"],
+			"@mul": "term * factor",
+			"@div": "term / factor",
+			"term": ["mul", "div", "factor"],
+			"@add": "expr + term",
+			"@sub": "expr - term",
+			"expr": ["add", "sub", "term"],
+			"@calc$": "expr"
+		}
+
+		def build(optimize):
+			p = Parser(grammar, optimize = optimize)
+			p.token("INT", r"\d+")
+			p.ignore(r"\s+")
+
+			return p
+
+		def expr(rnd, depth):
+			if depth <= 0 or rnd.random() < 0.3:
+				return str(rnd.randint(0, 99))
+			elif rnd.random() < 0.2:
+				return "(%s)" % expr(rnd, depth - 1)
+
+			return "%s %s %s" % (expr(rnd, depth - 1), rnd.choice("+-*/"),
+									expr(rnd, depth - 1))
+
+		self.check(build, self.corpus(lambda rnd: expr(rnd, 6)))
+
+	def test_inlined(self):
+		# Nonterminals inlined by the optimizer must still move the offset of
+		# parse errors.
+		grammar = {
+			"A$": ["D D c", "X C ("],
+			"C": ["X X @D"],
+			"D": ["", "a", "a b"]
+		}
+
+		def build(optimize):
+			p = Parser(grammar, optimize = optimize)
+			p.token("X", r"x+|y")
+
+			return p
+
+		for optimize in [False, True]:
+			p = build(optimize)
+			self.assertEqual(result(p, "xx"), 2)
+			self.assertEqual(result(p, "xxxx+"), 4)
+
+		self.check(build, self.corpus(lambda rnd: "".join(
+					[rnd.choice(["x", "xx", "y", "a", "b", "c", "(", "+"])
+						for i in range(rnd.randint(0, 8))])))
+
+if __name__ == "__main__":
+	unittest.main()